@@ -1,35 +1,31 @@
 import os
 import streamlit as st
 from dotenv import load_dotenv
-from backend.loader import load_documents
-from backend.qa_chain_compatible_0325 import build_qa_chain
+from backend.catalog import get_catalog
+from backend.qa_chain_compatible_0325 import build_qa_chain, get_cached_embeddings, record_exchange
+from backend.answer_cache import SemanticAnswerCache, is_history_independent
+from backend.query_analyzer import QueryAnalyzer
+from backend.structured_answers import StructuredAnswerEngine
+from backend.webhooks import clear_submission, send_webhook, submission_nonce
+from backend.intent_router import IntentRouter, get_intent_classifier, BOOKING, MANAGE_BOOKING, RAG
 import json
-from pathlib import Path
 from langchain_core.runnables import RunnableConfig
-from backend.calendar_utils import get_available_slots
+from backend.calendar_utils import get_available_slots, invalidate_availability
+from backend.doctor_assignment import find_next_available, plan_no_preference
 from datetime import datetime
-import requests
 import uuid  
 
 # Load environment variables from .env file
 load_dotenv()
 N8N_WEBHOOK_BOOK = os.getenv("WEBHOOK_BOOK")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+# "Next available" search: how many times to offer, over how many days
+NEXT_AVAILABLE_COUNT = 8
+NEXT_AVAILABLE_DAYS = int(os.getenv("NEXT_AVAILABLE_DAYS", "14"))
 credentials_path = os.getenv("GOOGLE_CREDENTIALS_PATH")
 
-# Load treatment data from JSON
-with open("data/aesthetic_treatments_final.json", "r", encoding="utf-8") as f:
-    treatment_data_list = json.load(f)
-
-fallback_duration = {
-    "Consultation": 20,
-    "Follow-up": 15
-}
-
-def get_duration(service_name, treatment_data_list):
-    for treatment in treatment_data_list:
-        if treatment["treatment"].lower() == service_name.lower():
-            return treatment.get("duration", 30)
-    return fallback_duration.get(service_name, 30)
+# Treatment catalog shared with the other pages, re-parsed only when the JSON changes
+catalog = get_catalog()
 
 st.set_page_config(page_title="💉 MedSpa RAG Chatbot")
 st.title("💬 Ask our AI Aesthetic Assistant")
@@ -37,13 +33,37 @@ st.title("💬 Ask our AI Aesthetic Assistant")
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+# One chat memory per browser session instead of a single shared "user" history
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
 @st.cache_resource
 def init_chain(data_version: float):  
-    docs = load_documents("data/aesthetic_treatments_final.json")
+    # Field-level chunks so retrieval can return just "Botox / post-care" instead of whole sheets
+    docs = get_catalog().documents(by_field=True)
     return build_qa_chain(docs)
 
-data_version = Path("data/aesthetic_treatments_final.json").stat().st_mtime
+# Shared by every session; entries are tied to the catalog version they were answered from
+@st.cache_resource
+def init_answer_cache():
+    embedding, _ = get_cached_embeddings()
+    analyzer = QueryAnalyzer(get_catalog().names)
+    return SemanticAnswerCache(embedding, threshold=ANSWER_CACHE_THRESHOLD, signature=analyzer.signature)
+
+# Price / duration / frequency questions answered straight from the catalog, no LLM
+@st.cache_resource
+def init_structured_engine(data_version: float):
+    return StructuredAnswerEngine(get_catalog().items)
+
+# Booking / manage / small talk / catalog answers are decided before touching retrieval or the LLM
+@st.cache_resource
+def init_intent_router(data_version: float):
+    return IntentRouter(init_structured_engine(data_version), classifier=get_intent_classifier())
+
+data_version = catalog.version
 qa_chain = init_chain(data_version)
+answer_cache = init_answer_cache()
+router = init_intent_router(data_version)
 
 
 query = st.text_input(
@@ -51,10 +71,6 @@ query = st.text_input(
     placeholder="e.g., Can I wear makeup after microneedling?"
 )
 
-def detect_booking_intent(message: str) -> bool:
-    keywords = ["book", "appointment", "consultation", "schedule", "I'd like to come", "can I visit", "预约", "咨询"]
-    return any(k.lower() in message.lower() for k in keywords)
-
 if query:
     with st.spinner("Thinking..."):
         if isinstance(query, dict):
@@ -62,7 +78,12 @@ if query:
 
         assert isinstance(query, str)
 
-        if detect_booking_intent(query):
+        # Catalog answers need the treatment named in the question itself (the engine checks),
+        # so pronouns don't keep them out; the pronoun heuristic only guards the answer cache
+        cacheable = is_history_independent(query)
+        intent, answer = router.route(query)
+
+        if intent == BOOKING:
             st.warning("🗓️ It looks like you'd like to book a consultation or treatment. Please fill in your info below 👇")
 
             if "selected_doctor" not in st.session_state:
@@ -80,41 +101,55 @@ if query:
                 st.session_state.selected_doctor = new_doctor
                 st.rerun()
 
-            new_date = st.date_input(
-                "Select appointment date",
-                value=st.session_state.selected_date,
-                min_value=datetime.today().date()
-            )
-            if new_date != st.session_state.selected_date:
-                st.session_state.selected_date = new_date
-                st.rerun()
+            search_mode = st.radio("How would you like to pick a time?", ["Next available", "Choose a date"], horizontal=True)
+
+            if search_mode == "Choose a date":
+                new_date = st.date_input(
+                    "Select appointment date",
+                    value=st.session_state.selected_date,
+                    min_value=datetime.today().date()
+                )
+                if new_date != st.session_state.selected_date:
+                    st.session_state.selected_date = new_date
+                    st.rerun()
 
-            treatment_options = ["Consultation"] + [t["treatment"] for t in treatment_data_list]
+            treatment_options = list(catalog.treatment_options)
             service = st.selectbox("Select a treatment", treatment_options)
-            duration = get_duration(service, treatment_data_list)
+            duration = catalog.get_duration(service)
 
             date_str = st.session_state.selected_date.strftime("%Y-%m-%d")
             doctor = st.session_state.selected_doctor
             slots = []
 
-            if doctor == "No preference":
-                for doc in ["Dr A", "Dr B"]:
-                    temp = get_available_slots(doc, date_str, duration)
-                    if temp:
-                        slots = temp
-                        doctor = doc
-                        st.session_state.selected_doctor = doc
-                        st.info(f"👨‍⚕️ Automatically assigned to **{doc}** with available slots.")
-                        break
+            if search_mode == "Next available":
+                # Earliest times over the coming days from one busy fetch, instead of trying dates one by one
+                doctors = ["Dr A", "Dr B"] if doctor == "No preference" else [doctor]
+                found = find_next_available(doctors, duration, count=NEXT_AVAILABLE_COUNT, days=NEXT_AVAILABLE_DAYS)
+                choices = {f"{r['slot']} — {r['doctor']}": r for r in found}
+                if choices:
+                    choice = st.selectbox("Earliest available times", options=list(choices), key=f"next_{doctor}_{duration}")
+                    time_slot, doctor = choices[choice]["slot"], choices[choice]["doctor"]
+                else:
+                    time_slot = None
+                    st.info(f"⚠️ No available slots in the next {NEXT_AVAILABLE_DAYS} days.")
+            elif doctor == "No preference":
+                # Every doctor's free times from one busy fetch, merged into a single list;
+                # each time goes to the doctor the load-balancing policy prefers
+                plan = plan_no_preference(["Dr A", "Dr B"], date_str, duration)
+                slots = list(plan["timeline"])
             else:
                 slots = get_available_slots(doctor, date_str, duration)
 
-            slot_key = f"slot_{doctor}_{date_str}"
-            if slots:
-                time_slot = st.selectbox("Choose a time slot", options=slots, key=slot_key)
-            else:
-                time_slot = None
-                st.info("⚠️ No available slots for the selected date and doctor.")
+            if search_mode == "Choose a date":
+                slot_key = f"slot_{doctor}_{date_str}"
+                if slots:
+                    time_slot = st.selectbox("Choose a time slot", options=slots, key=slot_key)
+                    if doctor == "No preference":
+                        doctor = plan["assignments"][time_slot]
+                        st.info(f"👨‍⚕️ Automatically assigned to **{doctor}** for this time.")
+                else:
+                    time_slot = None
+                    st.info("⚠️ No available slots for the selected date and doctor.")
 
             with st.form("booking_form"):
                 name = st.text_input("Name")
@@ -136,8 +171,11 @@ if query:
                             note_parts.append(f"Recent treatment: {recent_treatment}")
                         note = ". ".join(note_parts)
 
-                        # ✅ Generate permanent booking_id
-                        booking_id = str(uuid.uuid4())
+                        # ✅ Permanent booking_id, kept until this submission is queued so a
+                        # double click or rerun sends the same booking (and idempotency key) again
+                        if "booking_id" not in st.session_state:
+                            st.session_state.booking_id = str(uuid.uuid4())
+                        booking_id = st.session_state.booking_id
 
                         payload = {
                             "booking_id": booking_id,  # ✅ NEW
@@ -152,21 +190,44 @@ if query:
                             "note": note
                         }
 
-                        res = requests.post(
-                            N8N_WEBHOOK_BOOK,
-                            json=payload
-                        )
-
-                        if res.status_code == 200:
-                            st.success("✅ Your booking request has been sent!")
-                        else:
-                            st.error("❌ Failed to send booking. Please try again.")
+                        # Queued in the durable outbox; a background worker delivers it to n8n with retries
+                        try:
+                            _, created = send_webhook(N8N_WEBHOOK_BOOK, payload,
+                                                      submission_nonce(st.session_state, "book", payload))
+                            if created:
+                                st.success("✅ Your booking request has been received! A confirmation email will follow shortly.")
+                            else:
+                                st.info("ℹ️ This booking was already submitted.")
+                            # Queued: the next booking from this session is a new one
+                            st.session_state.pop("booking_id", None)
+                            clear_submission(st.session_state, "book")
+                        except Exception as e:
+                            st.error(f"❌ Failed to send booking. Please try again. ({e})")
+                        # The slot is no longer free; don't serve it from cache
+                        invalidate_availability(doctor, time_slot[:10])
+        elif intent == MANAGE_BOOKING:
+            st.info("📋 To cancel or reschedule, please use the **Manage your appointment** link in your confirmation email.")
         else:
-            result = qa_chain.invoke(
-                {"question": query},
-                config=RunnableConfig(configurable={"session_id": "user"})
-            )
-            answer = result
+            # Small talk and catalog answers come from the router; FAQ repeats that don't
+            # lean on the conversation come from the semantic cache, and only then the RAG chain
+            if intent == RAG and cacheable:
+                answer = answer_cache.lookup(query, data_version)
+            if answer is not None:
+                record_exchange(st.session_state.session_id, query, answer)
+            else:
+                # Render tokens as they arrive; RunnableWithMessageHistory writes the
+                # full answer to the session history once the stream is exhausted
+                live_answer = st.empty()
+                with live_answer.container():
+                    st.markdown(f"**🧍 You:** {query}")
+                    answer = st.write_stream(qa_chain.stream(
+                        {"question": query},
+                        config=RunnableConfig(configurable={"session_id": st.session_state.session_id})
+                    ))
+                # The finished answer is shown in the history below
+                live_answer.empty()
+                if cacheable:
+                    answer_cache.store(query, answer, data_version)
             st.session_state.chat_history.append((query, answer))
 
 if st.session_state.chat_history:
@@ -1,11 +1,10 @@
 import streamlit as st
-import requests
-import gspread
 import uuid
-from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime, timedelta
-from backend.calendar_utils import get_available_slots
-import json
+from backend.calendar_utils import get_available_slots, invalidate_availability
+from backend.sheet_utils import find_appointment_by_booking_id
+from backend.catalog import get_catalog
+from backend.webhooks import send_webhook, submission_nonce
 import pytz
 import os
 from dotenv import load_dotenv
@@ -14,20 +13,8 @@ load_dotenv()
 N8N_WEBHOOK_MANAGE = os.getenv("WEBHOOK_MANAGE")
 credentials_path = os.getenv("GOOGLE_CREDENTIALS_PATH")
 
-# Load treatment data
-with open("data/aesthetic_treatments_final.json", "r", encoding="utf-8") as f:
-    treatment_data_list = json.load(f)
-
-fallback_duration = {
-    "Consultation": 20,
-    "Follow-up": 15
-}
-
-def get_duration(service_name):
-    for treatment in treatment_data_list:
-        if treatment["treatment"].lower() == service_name.lower():
-            return treatment.get("duration", 30)
-    return fallback_duration.get(service_name, 30)
+# Load treatment data (shared catalog, re-parsed only when the JSON changes)
+catalog = get_catalog()
 
 st.set_page_config(page_title="📅 Manage Appointment")
 st.title("📋 Manage Your Appointment")
@@ -42,18 +29,8 @@ if not booking_id:
 
 # --- Load appointment from Google Sheets ---
 def get_appointment_by_booking_id(booking_id):
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_name(
-        credentials_path, scope)
-    client = gspread.authorize(creds)
-
-    sheet = client.open("Aesthetic_clinique").worksheet("clients_info")
-    data = sheet.get_all_records()
-
-    for row in data:
-        if str(row.get("booking_id", "")).strip() == str(booking_id).strip():
-            return row
-    return {}
+    # Indexed lookup in the local SQLite mirror of clients_info instead of a full-sheet download
+    return find_appointment_by_booking_id(booking_id) or {}
 
 appointment = get_appointment_by_booking_id(booking_id) if booking_id else {}
 old_doctor = appointment.get("doctor", "")
@@ -126,11 +103,15 @@ if action == "Cancel Appointment":
             "service": service
         }
 
-        res = requests.post(N8N_WEBHOOK_MANAGE , json=payload)
-        if res.status_code == 200:
-            st.success("✅ Appointment successfully cancelled.")
-        else:
-            st.error("❌ Failed to cancel appointment.")
+        try:
+            _, created = send_webhook(N8N_WEBHOOK_MANAGE, payload, submission_nonce(st.session_state, "cancel", payload))
+            if created:
+                st.success("✅ Your cancellation request has been received. A confirmation email will follow.")
+            else:
+                st.info("ℹ️ This cancellation was already submitted.")
+        except Exception as e:
+            st.error(f"❌ Failed to cancel appointment. ({e})")
+        invalidate_availability(old_doctor, parsed_date)
 
 
 # --- Reschedule Appointment ---
@@ -138,9 +119,9 @@ if action == "Reschedule Appointment":
     doctor = st.selectbox("👩‍⚕️ Select a doctor", ["Dr A", "Dr B"])
     new_date = st.date_input("📅 Select a new date", min_value=datetime.today().date())
 
-    treatment_options = ["Consultation"] + [t["treatment"] for t in treatment_data_list]
+    treatment_options = list(catalog.treatment_options)
     treatment = st.selectbox("💆 Select a treatment", options=treatment_options)
-    duration = get_duration(treatment)
+    duration = catalog.get_duration(treatment)
 
     slots = get_available_slots(doctor, new_date.strftime("%Y-%m-%d"), duration)
     if slots:
@@ -184,8 +165,13 @@ if action == "Reschedule Appointment":
                 "start_time": start_time_str,
                 "end_time": end_time_str
             }
-            res = requests.post(N8N_WEBHOOK_MANAGE, json=payload)
-            if res.status_code == 200:
-                st.success("✅ Appointment successfully rescheduled.")
-            else:
-                st.error("❌ Failed to reschedule appointment.")
+            try:
+                _, created = send_webhook(N8N_WEBHOOK_MANAGE, payload, submission_nonce(st.session_state, "reschedule", payload))
+                if created:
+                    st.success("✅ Your reschedule request has been received. A confirmation email will follow.")
+                else:
+                    st.info("ℹ️ This reschedule was already submitted.")
+            except Exception as e:
+                st.error(f"❌ Failed to reschedule appointment. ({e})")
+            invalidate_availability(old_doctor, original_date)
+            invalidate_availability(doctor, new_date)
@@ -0,0 +1,158 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from backend.embedding_cache import normalize_text
+
+# Questions containing these refer back to the conversation, so their answer depends on history
+_CONTEXT_REFERENCE_RE = re.compile(
+    r"\b(it|its|that|this|these|those|they|them|same|above|previous|else|also|one)\b"
+    r"|^\s*(and|but|so|what about|how about|et|mais)\b"
+    r"|\b(ça|cela|celui|celle)\b"
+    r"|它|那个|这个|刚才",
+    re.IGNORECASE,
+)
+
+
+def is_history_independent(question: str) -> bool:
+    return not _CONTEXT_REFERENCE_RE.search(question)
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question embedding. A new question is served from the
+    cache when its cosine similarity to a stored question reaches `threshold`
+    and both share the same signature (e.g. the treatments and fields they
+    mention), so "Botox price" never answers "Filler price".
+    Entries expire after `ttl_seconds`, the least recently used are evicted
+    past `max_entries`, and everything is dropped when the catalog version changes.
+    """
+
+    def __init__(self, embedding, threshold=0.95, max_entries=500, ttl_seconds=24 * 3600,
+                 signature=None, clock=time.monotonic):
+        self.embedding = embedding
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.signature = signature or (lambda question: None)
+        self.clock = clock
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # normalized question -> entry dict
+        self._keys = []                 # row i of the matrix belongs to self._keys[i]
+        self._rows = {}                 # key -> row
+        self._buffer = None             # preallocated rows; the first len(self._keys) are in use
+
+    @property
+    def _matrix(self):
+        return self._buffer[:len(self._keys)] if self._keys else None
+
+    def _check_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self._keys, self._rows, self._buffer = [], {}, None
+            self.version = version
+
+    def _put_row(self, key, vector):
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._keys)
+            if self._buffer is None or row == len(self._buffer):
+                # Grow by doubling, so storing an answer doesn't copy every vector each time
+                grown = np.empty((max(16, 2 * row), vector.shape[0]), dtype=np.float32)
+                if row:
+                    grown[:row] = self._buffer[:row]
+                self._buffer = grown
+            self._keys.append(key)
+            self._rows[key] = row
+        self._buffer[row] = vector
+
+    def _drop_rows(self, keys):
+        keep = [i for i, k in enumerate(self._keys) if k not in keys]
+        self._buffer[:len(keep)] = self._buffer[keep]
+        self._keys = [self._keys[i] for i in keep]
+        self._rows = {k: i for i, k in enumerate(self._keys)}
+
+    def _evict(self):
+        now = self.clock()
+        evicted = {k for k, e in self._entries.items() if e["expires_at"] <= now}
+        for k in evicted:
+            del self._entries[k]
+        while len(self._entries) > self.max_entries:
+            evicted.add(self._entries.popitem(last=False)[0])
+        if evicted:
+            self._drop_rows(evicted)
+
+    def _vector(self, question):
+        vector = np.asarray(self.embedding.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _hit(self, entry):
+        if entry is not None and entry["expires_at"] > self.clock():
+            self._entries.move_to_end(entry["key"])
+            self.hits += 1
+            return entry["answer"]
+        return None
+
+    def lookup(self, question, version):
+        key = normalize_text(question)
+        signature = self.signature(question)
+        with self._lock:
+            self._check_version(version)
+            # Exact repeat: no embedding needed
+            answer = self._hit(self._entries.get(key))
+            if answer is not None:
+                return answer
+            empty = not self._keys
+        if empty:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Embedding may be a network call (OpenAI), so other sessions are not held up by it
+        vector = self._vector(question)
+        with self._lock:
+            self._check_version(version)
+            entry = None
+            if self._keys:
+                scores = self._matrix @ vector
+                for i in np.argsort(-scores):
+                    if scores[i] < self.threshold:
+                        break
+                    candidate = self._entries[self._keys[i]]
+                    if candidate["signature"] == signature:
+                        entry = candidate
+                        break
+            answer = self._hit(entry)
+            if answer is None:
+                self.misses += 1
+            return answer
+
+    def store(self, question, answer, version):
+        key = normalize_text(question)
+        entry = {
+            "key": key,
+            "answer": answer,
+            "signature": self.signature(question),
+            "vector": self._vector(question),
+            "expires_at": self.clock() + self.ttl_seconds,
+        }
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._put_row(key, entry["vector"])
+            self._evict()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,114 @@
+from datetime import datetime, date, time, timedelta
+import math
+import numpy as np
+
+# Size of one occupancy cell. Every busy interval, break and candidate slot is
+# snapped onto this grid, so a doctor-day is a small boolean array.
+SLOT_RESOLUTION_MINUTES = 5
+
+
+def parse_rfc3339(value: str) -> datetime:
+    # Google returns "Z" for UTC, which older fromisoformat() versions reject
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def event_bounds(event, tz):
+    """
+    Returns (start, end) as aware datetimes in `tz` for a Calendar event or a
+    freebusy entry. All-day events ({"date": ...}) span whole days.
+    Returns None for events that do not block time.
+    """
+    if event.get("status") == "cancelled" or event.get("transparency") == "transparent":
+        return None
+
+    start, end = event.get("start"), event.get("end")
+    if isinstance(start, str):
+        # freebusy busy entries are plain {"start": iso, "end": iso}
+        return parse_rfc3339(start).astimezone(tz), parse_rfc3339(end).astimezone(tz)
+
+    if start.get("dateTime"):
+        return (
+            parse_rfc3339(start["dateTime"]).astimezone(tz),
+            parse_rfc3339(end["dateTime"]).astimezone(tz),
+        )
+
+    # All-day event: end date is exclusive
+    start_day = date.fromisoformat(start["date"])
+    end_day = date.fromisoformat(end["date"]) if end and end.get("date") else start_day + timedelta(days=1)
+    return (
+        tz.localize(datetime.combine(start_day, time.min)),
+        tz.localize(datetime.combine(end_day, time.min)),
+    )
+
+
+def build_occupancy(day_start, day_end, busy_intervals, breaks=(), buffer_minutes=0,
+                    resolution=SLOT_RESOLUTION_MINUTES):
+    """
+    Returns a boolean array with one cell per `resolution` minutes between
+    day_start and day_end; True means the cell is blocked.
+    Busy intervals are widened by `buffer_minutes` on both sides so that any
+    slot placed in the gaps leaves room for cleanup.
+    """
+    n_cells = int((day_end - day_start).total_seconds() // (resolution * 60))
+    if n_cells <= 0:
+        return np.zeros(0, dtype=bool)
+
+    buffer = timedelta(minutes=buffer_minutes)
+    offsets = []
+    for start, end in busy_intervals:
+        offsets.append((start - buffer - day_start, end + buffer - day_start))
+    for start, end in breaks:
+        offsets.append((start - day_start, end - day_start))
+
+    if not offsets:
+        return np.zeros(n_cells, dtype=bool)
+
+    seconds = np.array(
+        [(s.total_seconds(), e.total_seconds()) for s, e in offsets], dtype=np.float64
+    )
+    cell = resolution * 60
+    # A cell is blocked as soon as an interval touches any part of it
+    first = np.clip(np.floor(seconds[:, 0] / cell), 0, n_cells).astype(np.int64)
+    last = np.clip(np.ceil(seconds[:, 1] / cell), 0, n_cells).astype(np.int64)
+    keep = last > first
+
+    # Difference array: +1 where an interval opens, -1 where it closes
+    diff = np.zeros(n_cells + 1, dtype=np.int32)
+    np.add.at(diff, first[keep], 1)
+    np.add.at(diff, last[keep], -1)
+    return np.cumsum(diff[:-1]) > 0
+
+
+def free_start_cells(occupancy, duration_cells, step_cells=1):
+    """
+    Returns the cell indices (multiples of `step_cells`) where a run of
+    `duration_cells` free cells begins.
+    """
+    n_cells = occupancy.shape[0]
+    if duration_cells <= 0 or duration_cells > n_cells:
+        return np.zeros(0, dtype=np.int64)
+
+    # Busy cells inside [i, i + duration) via prefix sums, for every i at once
+    prefix = np.concatenate(([0], np.cumsum(occupancy, dtype=np.int32)))
+    busy_in_window = prefix[duration_cells:] - prefix[:-duration_cells]
+    candidates = np.arange(0, n_cells - duration_cells + 1, max(1, step_cells))
+    return candidates[busy_in_window[candidates] == 0]
+
+
+def find_free_slots(day_start, day_end, busy_intervals, duration_minutes, step_minutes=None,
+                    breaks=(), buffer_minutes=0, resolution=SLOT_RESOLUTION_MINUTES):
+    """
+    Returns the start datetimes of every `duration_minutes` slot between
+    day_start and day_end that avoids busy intervals, breaks and buffers.
+    Start times are spaced `step_minutes` apart (defaults to the duration).
+    """
+    step_minutes = step_minutes or duration_minutes
+    occupancy = build_occupancy(day_start, day_end, busy_intervals, breaks, buffer_minutes, resolution)
+    duration_cells = math.ceil(duration_minutes / resolution)
+    step_cells = max(1, math.ceil(step_minutes / resolution))
+
+    starts = free_start_cells(occupancy, duration_cells, step_cells)
+    cell = timedelta(minutes=resolution)
+    return [day_start + cell * int(i) for i in starts]
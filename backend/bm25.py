@@ -0,0 +1,115 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, List
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from backend.query_analyzer import vector_search
+from backend.vector_index import content_hash
+
+# Keeps tokens such as "1ml", "2areas" or "hifu" intact
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it my of on or the to what when with you your".split()
+)
+
+
+def tokenize(text: str):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an in-memory inverted index.
+    Postings are stored as NumPy arrays so a query term scores all of its
+    documents in one vectorised step.
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for i, doc in enumerate(self.documents):
+            counts = Counter(tokenize(doc.page_content))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term][0].append(i)
+                postings[term][1].append(tf)
+
+        n_docs = len(self.documents)
+        self.doc_lengths = np.array(lengths, dtype=np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if n_docs else 0.0
+        self.postings = {}
+        self.idf = {}
+        for term, (ids, tfs) in postings.items():
+            self.postings[term] = (np.array(ids, dtype=np.int32), np.array(tfs, dtype=np.float32))
+            df = len(ids)
+            self.idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def scores(self, query):
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        if not self.documents:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / (self.avg_length or 1.0))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            ids, tfs = self.postings[term]
+            scores[ids] += self.idf[term] * tfs * (self.k1 + 1) / (tfs + norm[ids])
+        return scores
+
+    def search(self, query, k=4, filter=None):
+        """Returns [(document, score)] with a positive score, best first."""
+        scores = self.scores(query)
+        if filter:
+            for key, wanted in filter.items():
+                allowed = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+                mask = np.array([d.metadata.get(key) in allowed for d in self.documents], dtype=bool)
+                scores = np.where(mask, scores, 0.0)
+        hits = np.flatnonzero(scores > 0)
+        if hits.size == 0:
+            return []
+        k = min(k, hits.size)
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+
+def reciprocal_rank_fusion(ranked_lists, rrf_k=60):
+    """
+    Fuses several best-first document lists; each document scores
+    sum(1 / (rrf_k + rank)). Returns [(document, score)] best first.
+    """
+    scores, docs = {}, {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = content_hash(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return [(docs[key], score) for key, score in sorted(scores.items(), key=lambda kv: -kv[1])]
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense + BM25 retrieval fused with reciprocal rank fusion."""
+
+    vectorstore: Any
+    bm25: Any
+    k: int = 4
+    candidates: int = 20
+    rrf_k: int = 60
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def search(self, query, filter=None):
+        dense = vector_search(self.vectorstore, query, self.candidates, filter)
+        sparse = [doc for doc, _ in self.bm25.search(query, k=self.candidates, filter=filter)]
+        return [doc for doc, _ in reciprocal_rank_fusion([dense, sparse], self.rrf_k)[:self.k]]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search(query)
@@ -0,0 +1,191 @@
+from datetime import datetime
+import pytz
+from backend.availability import event_bounds, parse_rfc3339
+
+TIMEZONE = "Europe/Paris"
+
+
+class SyncTokenExpired(Exception):
+    """The Calendar API answered 410 Gone: the sync token is no longer valid, do a full sync."""
+
+
+class CalendarBackend:
+    """
+    Minimal calendar interface used by the availability code.
+    Busy intervals are returned as aware (start, end) datetimes.
+    """
+
+    def freebusy(self, calendar_ids, time_min: datetime, time_max: datetime):
+        """Returns {calendar_id: [(start, end), ...]} for every requested calendar."""
+        raise NotImplementedError
+
+    def list_events(self, calendar_id, time_min: datetime, time_max: datetime):
+        """Returns the Calendar API event dicts overlapping [time_min, time_max)."""
+        raise NotImplementedError
+
+    def sync_events(self, calendar_id, sync_token=None, time_min: datetime = None):
+        """
+        Incremental sync. Without a token, returns every event from `time_min`
+        on; with one, only events changed since (deleted ones with status
+        "cancelled"). Returns (events, next_sync_token); raises SyncTokenExpired.
+        """
+        raise NotImplementedError
+
+
+class GoogleCalendarBackend(CalendarBackend):
+    def __init__(self, service_factory):
+        self.service_factory = service_factory
+
+    def freebusy(self, calendar_ids, time_min, time_max):
+        calendar_ids = list(dict.fromkeys(c for c in calendar_ids if c))
+        if not calendar_ids:
+            return {}
+
+        # One round-trip for every calendar and the whole time range
+        result = self.service_factory().freebusy().query(body={
+            "timeMin": time_min.isoformat(),
+            "timeMax": time_max.isoformat(),
+            "timeZone": TIMEZONE,
+            "items": [{"id": c} for c in calendar_ids],
+        }).execute()
+
+        tz = pytz.timezone(TIMEZONE)
+        busy = {}
+        for calendar_id in calendar_ids:
+            entry = result.get("calendars", {}).get(calendar_id, {})
+            if entry.get("errors"):
+                raise RuntimeError(f"Free/busy lookup failed for {calendar_id}: {entry['errors']}")
+            busy[calendar_id] = [
+                (parse_rfc3339(b["start"]).astimezone(tz), parse_rfc3339(b["end"]).astimezone(tz))
+                for b in entry.get("busy", [])
+            ]
+        return busy
+
+    def list_events(self, calendar_id, time_min, time_max):
+        events, page_token = [], None
+        while True:
+            result = self.service_factory().events().list(
+                calendarId=calendar_id,
+                timeMin=time_min.isoformat(),
+                timeMax=time_max.isoformat(),
+                singleEvents=True,
+                orderBy="startTime",
+                pageToken=page_token,
+            ).execute()
+            events.extend(result.get("items", []))
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                return events
+
+    def sync_events(self, calendar_id, sync_token=None, time_min=None):
+        from googleapiclient.errors import HttpError
+
+        # syncToken can't be combined with timeMin/orderBy; the window only bounds the first full sync
+        params = {"calendarId": calendar_id, "singleEvents": True, "maxResults": 2500}
+        if sync_token:
+            params["syncToken"] = sync_token
+        elif time_min is not None:
+            params["timeMin"] = time_min.isoformat()
+
+        events, page_token = [], None
+        while True:
+            try:
+                result = self.service_factory().events().list(pageToken=page_token, **params).execute()
+            except HttpError as e:
+                if e.resp.status == 410:
+                    raise SyncTokenExpired(calendar_id) from e
+                raise
+            events.extend(result.get("items", []))
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                return events, result.get("nextSyncToken")
+
+
+class InMemoryCalendarBackend(CalendarBackend):
+    """
+    Offline stand-in for Google Calendar. Events use the Calendar API shape,
+    so all-day events ({"date": ...}) and transparency behave as in production.
+    """
+
+    def __init__(self, events=None):
+        self.events = {calendar_id: list(items) for calendar_id, items in (events or {}).items()}
+        self.calls = {"freebusy": 0, "list_events": 0, "sync_events": 0}
+        # Change log for sync tokens: [(sequence, calendar_id, event)], tokens are sequence numbers
+        self._changes = []
+        self._sequence = 0
+        self._oldest_valid_token = 0
+
+    def _record_change(self, calendar_id, event):
+        self._sequence += 1
+        self._changes.append((self._sequence, calendar_id, event))
+
+    def add_event(self, calendar_id, start: datetime, end: datetime, event_id=None, **extra):
+        event = {
+            "id": event_id or f"evt{sum(len(v) for v in self.events.values()) + 1}",
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": end.isoformat()},
+            **extra,
+        }
+        self.events.setdefault(calendar_id, []).append(event)
+        self._record_change(calendar_id, event)
+        return event
+
+    def update_event(self, calendar_id, event_id, start: datetime = None, end: datetime = None, **fields):
+        for event in self.events.get(calendar_id, []):
+            if event["id"] == event_id:
+                if start is not None:
+                    event["start"] = {"dateTime": start.isoformat()}
+                if end is not None:
+                    event["end"] = {"dateTime": end.isoformat()}
+                event.update(fields)
+                self._record_change(calendar_id, event)
+                return event
+        raise KeyError(event_id)
+
+    def delete_event(self, calendar_id, event_id):
+        events = self.events.get(calendar_id, [])
+        self.events[calendar_id] = [e for e in events if e["id"] != event_id]
+        self._record_change(calendar_id, {"id": event_id, "status": "cancelled"})
+
+    def expire_sync_tokens(self):
+        """Makes every token issued so far answer like a 410 Gone."""
+        self._oldest_valid_token = self._sequence + 1
+
+    def _overlapping(self, calendar_id, time_min, time_max, busy_only=True):
+        tz = pytz.timezone(TIMEZONE)
+        for event in self.events.get(calendar_id, []):
+            # events().list also returns transparent events; freebusy does not
+            bounds = event_bounds(event if busy_only else {"start": event["start"], "end": event["end"]}, tz)
+            if bounds and bounds[0] < time_max and bounds[1] > time_min:
+                yield event, bounds
+
+    def freebusy(self, calendar_ids, time_min, time_max):
+        self.calls["freebusy"] += 1
+        return {
+            calendar_id: sorted(bounds for _, bounds in self._overlapping(calendar_id, time_min, time_max))
+            for calendar_id in calendar_ids if calendar_id
+        }
+
+    def list_events(self, calendar_id, time_min, time_max):
+        self.calls["list_events"] += 1
+        return [event for event, _ in sorted(
+            self._overlapping(calendar_id, time_min, time_max, busy_only=False), key=lambda item: item[1][0]
+        )]
+
+    def sync_events(self, calendar_id, sync_token=None, time_min=None):
+        self.calls["sync_events"] += 1
+        if sync_token is None:
+            events = list(self.events.get(calendar_id, []))
+            if time_min is not None:
+                tz = pytz.timezone(TIMEZONE)
+                events = [e for e in events if event_bounds({"start": e["start"], "end": e["end"]}, tz)[1] > time_min]
+            return [dict(e) for e in events], str(self._sequence)
+
+        since = int(sync_token)
+        if since < self._oldest_valid_token:
+            raise SyncTokenExpired(calendar_id)
+        latest = {}
+        for sequence, changed_calendar, event in self._changes:
+            if sequence > since and changed_calendar == calendar_id:
+                latest[event["id"]] = dict(event)
+        return list(latest.values()), str(self._sequence)
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+import pytz
+from backend.availability import event_bounds
+from backend.calendar_backend import TIMEZONE, CalendarBackend, SyncTokenExpired
+
+# "1" answers availability and dashboard queries from a locally synced copy of each calendar
+CALENDAR_SYNC = os.getenv("CALENDAR_SYNC", "1") == "1"
+# How often a calendar is asked for changes, at most
+CALENDAR_SYNC_INTERVAL = int(os.getenv("CALENDAR_SYNC_INTERVAL", "15"))
+# Days of history kept locally; older ranges are asked to the API directly
+CALENDAR_SYNC_DAYS_BACK = 7
+
+
+class EventStore:
+    """
+    Events of one calendar keyed by id, with an interval index: entries sorted
+    by start, plus the longest event duration, so an overlap query is one
+    bisect and a short scan instead of a pass over every event.
+
+    Writers build a new events dict and index and swap them in as one tuple,
+    so readers never take a lock and always see a consistent snapshot.
+    """
+
+    def __init__(self, tz=None):
+        self.tz = tz or pytz.timezone(TIMEZONE)
+        self._snapshot = self._build({})
+
+    @property
+    def events(self):
+        return self._snapshot[0]
+
+    def _build(self, events):
+        index = []
+        for event_id, event in events.items():
+            # Transparent events are listed on the dashboard, so they are indexed too
+            bounds = event_bounds({"start": event["start"], "end": event["end"]}, self.tz)
+            if bounds:
+                index.append((bounds[0], bounds[1], event_id))
+        index.sort()
+        starts = [start for start, _, _ in index]
+        max_duration = max((end - start for start, end, _ in index), default=timedelta(0))
+        # (events by id, sorted starts, [(start, end, event_id)] sorted by start, longest duration)
+        return events, starts, index, max_duration
+
+    def apply(self, events):
+        updated = dict(self._snapshot[0])
+        for event in events:
+            if event.get("status") == "cancelled":
+                updated.pop(event["id"], None)
+            else:
+                updated[event["id"]] = event
+        self._snapshot = self._build(updated)
+
+    def prune(self, before):
+        """Drops events that ended before `before` (they left the synced window)."""
+        events, _, index, _ = self._snapshot
+        expired = {event_id for _, end, event_id in index if end <= before}
+        if expired:
+            self._snapshot = self._build({k: v for k, v in events.items() if k not in expired})
+
+    def clear(self):
+        self._snapshot = self._build({})
+
+    def overlapping(self, time_min, time_max):
+        """[(start, end, event)] overlapping [time_min, time_max), sorted by start."""
+        events, starts, index, max_duration = self._snapshot
+        # Nothing starting before time_min - longest duration can still reach time_min
+        i = bisect_left(starts, time_min - max_duration)
+        found = []
+        for start, end, event_id in index[i:]:
+            if start >= time_max:
+                break
+            if end > time_min:
+                found.append((start, end, events[event_id]))
+        return found
+
+    def __len__(self):
+        return len(self._snapshot[0])
+
+
+class SyncedCalendarBackend(CalendarBackend):
+    """
+    Keeps a local EventStore per calendar up to date with syncToken deltas
+    and answers freebusy and list_events from it. A 410 Gone drops the store
+    and runs a full sync. Ranges older than the synced window go to the
+    wrapped backend.
+    """
+
+    def __init__(self, backend, sync_interval=CALENDAR_SYNC_INTERVAL, days_back=CALENDAR_SYNC_DAYS_BACK,
+                 clock=time.monotonic, now=None):
+        self.backend = backend
+        self.sync_interval = sync_interval
+        self.days_back = days_back
+        self.clock = clock
+        self.tz = pytz.timezone(TIMEZONE)
+        self.now = now or (lambda: datetime.now(self.tz))
+        self._stores = {}
+        self._tokens = {}
+        self._window_start = {}
+        self._last_sync = {}
+        self._lock = threading.RLock()
+
+    def mark_stale(self, calendar_id):
+        """Forces the next query on `calendar_id` to ask for changes (e.g. right after a booking)."""
+        with self._lock:
+            self._last_sync.pop(calendar_id, None)
+
+    def _current_window_start(self):
+        today = self.now().date()
+        return self.tz.localize(datetime.combine(today - timedelta(days=self.days_back), datetime.min.time()))
+
+    def _full_sync(self, calendar_id):
+        window_start = self._current_window_start()
+        events, token = self.backend.sync_events(calendar_id, time_min=window_start)
+        store = EventStore(self.tz)
+        store.apply(events)
+        store.prune(window_start)
+        self._stores[calendar_id] = store
+        self._tokens[calendar_id] = token
+        self._window_start[calendar_id] = window_start
+        print(f"📥 Full calendar sync for {calendar_id}: {len(store)} events")
+
+    def sync(self, calendar_id, force=False):
+        with self._lock:
+            now = self.clock()
+            last = self._last_sync.get(calendar_id)
+            if not force and last is not None and now - last < self.sync_interval:
+                return self._stores[calendar_id]
+            if calendar_id not in self._stores or not self._tokens.get(calendar_id):
+                self._full_sync(calendar_id)
+            else:
+                try:
+                    events, token = self.backend.sync_events(calendar_id, sync_token=self._tokens[calendar_id])
+                    self._stores[calendar_id].apply(events)
+                    self._tokens[calendar_id] = token
+                except SyncTokenExpired:
+                    print(f"🔄 Sync token expired for {calendar_id}, running a full sync")
+                    self._full_sync(calendar_id)
+                # Deltas keep arriving for past days; drop what slid out of the window
+                window_start = self._current_window_start()
+                if window_start > self._window_start[calendar_id]:
+                    self._stores[calendar_id].prune(window_start)
+                    self._window_start[calendar_id] = window_start
+            self._last_sync[calendar_id] = now
+            return self._stores[calendar_id]
+
+    def _covers(self, calendar_id, time_min):
+        return time_min >= self._window_start[calendar_id]
+
+    def freebusy(self, calendar_ids, time_min, time_max):
+        calendar_ids = list(dict.fromkeys(c for c in calendar_ids if c))
+        busy, remote = {}, []
+        for calendar_id in calendar_ids:
+            store = self.sync(calendar_id)
+            if not self._covers(calendar_id, time_min):
+                remote.append(calendar_id)
+                continue
+            busy[calendar_id] = [
+                (start, end) for start, end, event in store.overlapping(time_min, time_max)
+                if event_bounds(event, self.tz)   # skips transparent events, like freebusy
+            ]
+        if remote:
+            busy.update(self.backend.freebusy(remote, time_min, time_max))
+        return busy
+
+    def list_events(self, calendar_id, time_min, time_max):
+        store = self.sync(calendar_id)
+        if not self._covers(calendar_id, time_min):
+            return self.backend.list_events(calendar_id, time_min, time_max)
+        return [event for _, _, event in store.overlapping(time_min, time_max)]
+
+    def sync_events(self, calendar_id, sync_token=None, time_min=None):
+        return self.backend.sync_events(calendar_id, sync_token, time_min)
@@ -1,14 +1,16 @@
 from datetime import datetime, timedelta, time
 import pytz
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 import os
 from dotenv import load_dotenv
+from backend.availability import find_free_slots
+from backend.cache import TTLCache
+from backend.calendar_backend import GoogleCalendarBackend
+from backend.calendar_sync import CALENDAR_SYNC, SyncedCalendarBackend
+from backend.google_clients import get_calendar_service
 
 load_dotenv()
 DOCTOR_A_CALENDAR_ID = os.getenv("DOCTOR_A_CALENDAR_ID")
 DOCTOR_B_CALENDAR_ID = os.getenv("DOCTOR_B_CALENDAR_ID")
-credentials_path = os.getenv("GOOGLE_CREDENTIALS_PATH")
 
 # ✅ 1. Doctor calendar mapping
 DOCTORS = {
@@ -22,65 +24,159 @@ WORK_HOURS = {
     "end": time(17, 0)     # 05:00 PM
 }
 
-# ✅ 3. Load Google Calendar API credentials
+# Per-doctor overrides of WORK_HOURS. Supported keys:
+#   "start" / "end"      working hours for that doctor
+#   "breaks"             list of (start, end) times, e.g. lunch
+#   "buffer_minutes"     cleanup time kept free around existing appointments
+#   "closed_weekdays"    weekday numbers (Mon=0) with no availability
+DOCTOR_SCHEDULES = {
+    "Dr A": {},
+    "Dr B": {},
+}
+
+# Spacing between proposed start times, independent of the treatment duration
+SLOT_STEP_MINUTES = 15
+
+def get_doctor_schedule(doctor_name):
+    schedule = {
+        "start": WORK_HOURS["start"],
+        "end": WORK_HOURS["end"],
+        "breaks": [],
+        "buffer_minutes": 0,
+        "closed_weekdays": [],
+    }
+    schedule.update(DOCTOR_SCHEDULES.get(doctor_name, {}))
+    return schedule
+
+# ✅ 3. Google Calendar API client (one per process, requests share the pooled HttpPool connections)
 def get_google_calendar_service():
-    credentials = service_account.Credentials.from_service_account_file(
-        credentials_path,  # 🔁 Replace with your actual credentials file path
-        scopes=["https://www.googleapis.com/auth/calendar"]
-    )
-    return build("calendar", "v3", credentials=credentials)
+    return get_calendar_service()
+
+# ✅ 4. Pluggable calendar backend (Google in production, in-memory fake offline).
+# With CALENDAR_SYNC, queries are answered from a local copy kept current with syncToken deltas.
+_calendar_backend = None
+
+def get_calendar_backend():
+    global _calendar_backend
+    if _calendar_backend is None:
+        backend = GoogleCalendarBackend(get_google_calendar_service)
+        _calendar_backend = SyncedCalendarBackend(backend) if CALENDAR_SYNC else backend
+    return _calendar_backend
+
+def set_calendar_backend(backend):
+    global _calendar_backend
+    _calendar_backend = backend
+    busy_cache.clear()
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+# Fetch available time slots for a given doctor and date (excluding busy events)
+def get_available_slots(doctor_name, date_str, duration_minutes, step_minutes=None):
+    slots = get_available_slots_batch([doctor_name], date_str, date_str, duration_minutes, step_minutes)
+    return slots[(doctor_name, _as_date(date_str).strftime("%Y-%m-%d"))]
 
-# ✅ 4. Fetch available time slots for a given doctor and date (excluding busy events)
-def get_available_slots(doctor_name, date_str, duration_minutes):
-    if doctor_name not in DOCTORS:
-        raise ValueError(f"Unknown doctor: {doctor_name}")
-    
-    service = get_google_calendar_service()
-    calendar_id = DOCTORS[doctor_name]
+# Busy intervals per (calendar_id, "YYYY-MM-DD"), shared by every page in the process.
+# Kept short-lived and dropped whenever we post a booking change for that doctor-day.
+AVAILABILITY_CACHE_TTL_SECONDS = int(os.getenv("AVAILABILITY_CACHE_TTL", "60"))
+busy_cache = TTLCache(ttl_seconds=AVAILABILITY_CACHE_TTL_SECONDS, max_entries=2048)
 
-    # Parse date and define working hours range
+def invalidate_availability(doctor_name, *days):
+    calendar_id = DOCTORS.get(doctor_name)
+    for day in days:
+        if calendar_id and day:
+            busy_cache.invalidate((calendar_id, _as_date(day).strftime("%Y-%m-%d")))
+    # The synced copy asks for changes on its next use instead of waiting for its interval
+    if calendar_id and hasattr(_calendar_backend, "mark_stale"):
+        _calendar_backend.mark_stale(calendar_id)
+
+# Busy intervals for every doctor-day, from the cache or one freebusy query for the misses.
+# Returns {(doctor_name, "YYYY-MM-DD"): [(start, end), ...]}
+def get_busy_intervals(doctor_names, days, backend=None):
     tz = pytz.timezone("Europe/Paris")
-    target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    start_datetime = tz.localize(datetime.combine(target_date, WORK_HOURS["start"]))
-    end_datetime = tz.localize(datetime.combine(target_date, WORK_HOURS["end"]))
-
-    # Fetch events already booked on the calendar
-    events_result = service.events().list(
-        calendarId=calendar_id,
-        timeMin=start_datetime.isoformat(),
-        timeMax=end_datetime.isoformat(),
-        singleEvents=True,
-        orderBy="startTime"
-    ).execute()
-    events = events_result.get("items", [])
-
-    # Generate all possible time slots based on the treatment duration
-    slot = timedelta(minutes=duration_minutes)
-    current = start_datetime
-    all_slots = []
-    while current + slot <= end_datetime:
-        all_slots.append((current, current + slot))
-        current += slot
-
-    # Extract booked/busy time ranges
-    busy_slots = []
-    for event in events:
-        start = datetime.fromisoformat(event["start"]["dateTime"]).astimezone(tz)
-        end = datetime.fromisoformat(event["end"]["dateTime"]).astimezone(tz)
-        busy_slots.append((start, end))
-
-    # Check whether a slot overlaps with any busy period
-    def is_conflicting(start, end):
-        for busy_start, busy_end in busy_slots:
-            if start < busy_end and end > busy_start:
-                return True
-        return False
-
-    # Return all available (non-conflicting) slots as string
-    available_slots = []
-    for start, end in all_slots:
-        if not is_conflicting(start, end):
-            available_slots.append(start.strftime("%Y-%m-%d %H:%M"))
-
-    return available_slots
+    use_cache = backend is None
+    busy = {}
+    missing_calendars, missing_days = set(), set()
+    for doctor_name in doctor_names:
+        calendar_id = DOCTORS[doctor_name]
+        for day in days:
+            day_str = day.strftime("%Y-%m-%d")
+            cached = busy_cache.get((calendar_id, day_str)) if use_cache else None
+            if cached is None:
+                missing_calendars.add(calendar_id)
+                missing_days.add(day)
+            else:
+                busy[(doctor_name, day_str)] = cached
+
+    if missing_calendars:
+        # Whole local days, so cached entries do not depend on anyone's working hours
+        first, last = min(missing_days), max(missing_days)
+        time_min = tz.localize(datetime.combine(first, time.min))
+        time_max = tz.localize(datetime.combine(last + timedelta(days=1), time.min))
+        fetched = (backend or get_calendar_backend()).freebusy(sorted(missing_calendars), time_min, time_max)
+
+        for doctor_name in doctor_names:
+            calendar_id = DOCTORS[doctor_name]
+            if calendar_id not in missing_calendars:
+                continue
+            intervals = fetched.get(calendar_id, [])
+            for day in missing_days:
+                day_str = day.strftime("%Y-%m-%d")
+                day_start = tz.localize(datetime.combine(day, time.min))
+                day_end = tz.localize(datetime.combine(day + timedelta(days=1), time.min))
+                day_busy = [(s, e) for s, e in intervals if s < day_end and e > day_start]
+                if use_cache:
+                    busy_cache.put((calendar_id, day_str), day_busy)
+                busy.setdefault((doctor_name, day_str), day_busy)
+    return busy
+
+# Fetch slots for several doctors over a date range with a single freebusy query.
+# Returns {(doctor_name, "YYYY-MM-DD"): ["YYYY-MM-DD HH:MM", ...]}
+def get_available_slots_batch(doctor_names, start_date, end_date, duration_minutes, step_minutes=None, backend=None):
+    for doctor_name in doctor_names:
+        if doctor_name not in DOCTORS:
+            raise ValueError(f"Unknown doctor: {doctor_name}")
+    if not doctor_names:
+        return {}
+
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    busy = get_busy_intervals(doctor_names, days, backend)
+    return slots_from_busy(doctor_names, days, busy, duration_minutes, step_minutes)
 
+# Free slot labels for every doctor-day from already fetched busy intervals
+def slots_from_busy(doctor_names, days, busy, duration_minutes, step_minutes=None):
+    tz = pytz.timezone("Europe/Paris")
+    result = {}
+    for doctor_name in doctor_names:
+        schedule = get_doctor_schedule(doctor_name)
+        for day in days:
+            key = (doctor_name, day.strftime("%Y-%m-%d"))
+            if day.weekday() in schedule["closed_weekdays"]:
+                result[key] = []
+                continue
+            result[key] = compute_free_slots(schedule, day, busy[key], duration_minutes, step_minutes, tz)
+    return result
+
+# ✅ 5. Turn busy intervals into free slot labels with the occupancy bitmap
+def compute_free_slots(schedule, target_date, busy_slots, duration_minutes, step_minutes=None, tz=None):
+    tz = tz or pytz.timezone("Europe/Paris")
+    start_datetime = tz.localize(datetime.combine(target_date, schedule["start"]))
+    end_datetime = tz.localize(datetime.combine(target_date, schedule["end"]))
+    breaks = [
+        (tz.localize(datetime.combine(target_date, b_start)), tz.localize(datetime.combine(target_date, b_end)))
+        for b_start, b_end in schedule["breaks"]
+    ]
+
+    starts = find_free_slots(
+        start_datetime,
+        end_datetime,
+        busy_slots,
+        int(duration_minutes),
+        step_minutes=step_minutes or SLOT_STEP_MINUTES,
+        breaks=breaks,
+        buffer_minutes=schedule["buffer_minutes"],
+    )
+    return [start.strftime("%Y-%m-%d %H:%M") for start in starts]
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+from backend.query_analyzer import treatment_aliases
+
+CATALOG_PATH = os.path.join("data", "aesthetic_treatments_final.json")
+
+# Bookable services that are not in the treatment JSON
+FALLBACK_DURATION = {
+    "Consultation": 20,
+    "Follow-up": 15,
+}
+DEFAULT_DURATION = 30
+
+
+class Treatment:
+    __slots__ = ("name", "duration", "price", "recommended_frequency", "item")
+
+    def __init__(self, item):
+        self.name = str(item.get("treatment", ""))
+        try:
+            self.duration = int(item.get("duration", DEFAULT_DURATION))
+        except (TypeError, ValueError):
+            self.duration = DEFAULT_DURATION
+        self.price = item.get("price")
+        self.recommended_frequency = item.get("recommended_frequency")
+        self.item = item   # the original JSON object
+
+    def __repr__(self):
+        return f"Treatment({self.name!r})"
+
+
+class Catalog:
+    """
+    Parsed treatment JSON with a case-folded name/alias index and the lists
+    the pages need, built once per file version.
+    """
+
+    def __init__(self, items, version=None):
+        self.items = items
+        self.version = version
+        self.treatments = tuple(Treatment(item) for item in items)
+        self.names = tuple(t.name for t in self.treatments)
+        # Booking forms offer a consultation on top of every catalog treatment
+        self.treatment_options = ("Consultation",) + self.names
+
+        self._by_name = {}
+        self._by_alias = {}
+        for t in self.treatments:
+            self._by_name.setdefault(t.name.casefold(), t)
+            for alias in treatment_aliases(t.name):
+                self._by_alias.setdefault(alias.casefold(), t)
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        key = str(name or "").strip().casefold()
+        return self._by_name.get(key) or self._by_alias.get(key)
+
+    def get_duration(self, service_name):
+        treatment = self._by_name.get(str(service_name or "").strip().casefold())
+        if treatment is not None:
+            return treatment.duration
+        return int(FALLBACK_DURATION.get(service_name, DEFAULT_DURATION))
+
+    def documents(self, by_field=False):
+        """Documents for the vector index, built once per catalog version."""
+        with self._lock:
+            if by_field not in self._documents:
+                from backend.loader import build_documents
+                self._documents[by_field] = build_documents(self.items, by_field=by_field)
+            return list(self._documents[by_field])
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path=CATALOG_PATH) -> Catalog:
+    """
+    Process-wide catalog for `path`, re-parsed only when the file's mtime changes.
+    Every page and the RAG chain share the same instance.
+    """
+    version = os.stat(path).st_mtime
+    with _catalogs_lock:
+        catalog = _catalogs.get(path)
+        if catalog is None or catalog.version != version:
+            with open(path, "r", encoding="utf-8") as f:
+                catalog = Catalog(json.load(f), version)
+            _catalogs[path] = catalog
+        return catalog
@@ -0,0 +1,148 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from backend.tokens import count_tokens
+
+# Optional SQLite file for chat histories; empty keeps them in memory only
+CHAT_HISTORY_DB = os.getenv("CHAT_HISTORY_DB", "")
+CHAT_HISTORY_MAX_TOKENS = int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "1500"))
+CHAT_HISTORY_MAX_SESSIONS = int(os.getenv("CHAT_HISTORY_MAX_SESSIONS", "1000"))
+CHAT_HISTORY_IDLE_SECONDS = int(os.getenv("CHAT_HISTORY_IDLE_SECONDS", "3600"))
+
+
+class WindowedChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat history whose `messages` (what gets injected into the prompt) are the
+    most recent messages fitting in `max_tokens`. Older messages are dropped
+    from memory as well, so a long conversation never grows without bound.
+    """
+
+    def __init__(self, session_id, max_tokens=CHAT_HISTORY_MAX_TOKENS, store=None, messages=None):
+        self.session_id = session_id
+        self.max_tokens = max_tokens
+        self.store = store
+        self._messages = []   # [(message, tokens)]
+        self._tokens = 0
+        self._lock = threading.Lock()
+        for message in messages or []:
+            self._append(message)
+
+    def _append(self, message):
+        tokens = count_tokens(message.content if isinstance(message.content, str) else str(message.content))
+        self._messages.append((message, tokens))
+        self._tokens += tokens
+        # Always keep the latest message, even if it alone exceeds the budget
+        while self._tokens > self.max_tokens and len(self._messages) > 1:
+            _, dropped = self._messages.pop(0)
+            self._tokens -= dropped
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._lock:
+            return [m for m, _ in self._messages]
+
+    @property
+    def token_count(self):
+        return self._tokens
+
+    def add_message(self, message: BaseMessage) -> None:
+        with self._lock:
+            self._append(message)
+        if self.store is not None:
+            self.store.persist_message(self.session_id, message)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._messages, self._tokens = [], 0
+        if self.store is not None:
+            self.store.delete_session(self.session_id)
+
+
+class SessionHistoryStore:
+    """
+    Per-session chat histories with LRU eviction of idle sessions.
+    With `db_path`, messages are also written to SQLite and evicted sessions
+    are loaded back lazily the next time they are used.
+    """
+
+    def __init__(self, max_sessions=CHAT_HISTORY_MAX_SESSIONS, idle_seconds=CHAT_HISTORY_IDLE_SECONDS,
+                 max_tokens=CHAT_HISTORY_MAX_TOKENS, db_path=CHAT_HISTORY_DB, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_tokens = max_tokens
+        self.clock = clock
+        self._sessions = OrderedDict()   # session_id -> (history, last_used)
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            if db_path != ":memory:":
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,"
+                " message TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chat_messages_session ON chat_messages (session_id, id)")
+            self._conn.commit()
+
+    # --- Persistence ---
+    def persist_message(self, session_id, message):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO chat_messages (session_id, message, created_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(message_to_dict(message), ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def delete_session(self, session_id):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def _load(self, session_id):
+        if self._conn is None:
+            return []
+        # Newest first, stopping early: only what fits in the token window is ever needed
+        rows = self._conn.execute(
+            "SELECT message FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT 200",
+            (session_id,),
+        ).fetchall()
+        return messages_from_dict([json.loads(r[0]) for r in reversed(rows)])
+
+    # --- Sessions ---
+    def _evict(self, now):
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - last_used > self.idle_seconds:
+                del self._sessions[session_id]
+            else:
+                break
+
+    def get(self, session_id) -> WindowedChatMessageHistory:
+        now = self.clock()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is None or now - entry[1] > self.idle_seconds:
+                # Idle sessions start over, unless SQLite still has their messages
+                history = WindowedChatMessageHistory(
+                    session_id, self.max_tokens, store=self, messages=self._load(session_id)
+                )
+            else:
+                history = entry[0]
+            self._sessions[session_id] = (history, now)
+            self._evict(now)
+            return history
+
+    def __len__(self):
+        return len(self._sessions)
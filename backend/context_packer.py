@@ -0,0 +1,79 @@
+import os
+import re
+from collections import OrderedDict
+from backend.tokens import count_tokens
+
+# Total tokens we allow for context + history + question in one prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2000"))
+# Context never shrinks below this, however long the history is
+MIN_CONTEXT_TOKENS = int(os.getenv("MIN_CONTEXT_TOKENS", "300"))
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?;])\s+|,\s+(?=[A-Z])")
+
+
+def context_budget(history_tokens, question_tokens, total=PROMPT_TOKEN_BUDGET, minimum=MIN_CONTEXT_TOKENS):
+    return max(minimum, total - history_tokens - question_tokens)
+
+
+def _split_passage(text):
+    """Splits a document into (header, [lines]); the header is its "Treatment: ..." line."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if lines and lines[0].lower().startswith("treatment:"):
+        return lines[0], lines[1:]
+    return "", lines
+
+
+def _trim_line(line, budget):
+    """Longest sentence prefix of `line` that fits in `budget` tokens, or None."""
+    kept = []
+    for sentence in _SENTENCE_SPLIT_RE.split(line):
+        candidate = " ".join(kept + [sentence])
+        if count_tokens(candidate) > budget:
+            break
+        kept.append(sentence)
+    return " ".join(kept) if kept else None
+
+
+def pack_context(docs, budget):
+    """
+    Builds the prompt context from best-first `docs` within `budget` tokens.
+    Lines are taken in retrieval order until the budget is spent, repeated
+    lines are dropped, and a line that doesn't fit is trimmed at a sentence
+    boundary. The chosen lines are then grouped under one header per
+    treatment for rendering. Returns (context, report).
+    """
+    chosen = OrderedDict()   # header -> [lines], in the order treatments are first chosen
+    seen = set()
+    used, kept, trimmed_count, dropped = 0, 0, 0, 0
+    for doc in docs:
+        header, lines = _split_passage(doc.page_content)
+        for line in lines:
+            # Identical lines under different treatments still carry different facts
+            key = (header, " ".join(line.lower().split()))
+            if key in seen:
+                continue
+            seen.add(key)
+
+            header_cost = count_tokens(header + "\n") if header and header not in chosen else 0
+            cost = count_tokens(line + "\n") + header_cost
+            if used + cost > budget:
+                line = _trim_line(line, budget - used - header_cost - 1)
+                if not line:
+                    dropped += 1
+                    continue
+                cost = count_tokens(line + "\n") + header_cost
+                trimmed_count += 1
+            chosen.setdefault(header, []).append(line)
+            used += cost
+            kept += 1
+
+    blocks = ["\n".join(([header] if header else []) + lines) for header, lines in chosen.items()]
+    report = {
+        "context_tokens": used,
+        "budget": budget,
+        "passages": len(docs),
+        "lines_kept": kept,            # source lines only, trimmed ones included
+        "lines_trimmed": trimmed_count,
+        "lines_dropped": dropped,
+    }
+    return "\n\n".join(blocks), report
@@ -0,0 +1,124 @@
+import heapq
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+import pytz
+from backend.calendar_utils import DOCTORS, _as_date, get_busy_intervals, get_doctor_schedule, slots_from_busy
+
+# "least_booked" (default) or "earliest_free"
+ASSIGNMENT_POLICY = os.getenv("ASSIGNMENT_POLICY", "least_booked")
+POLICIES = ("least_booked", "earliest_free")
+
+
+def build_slot_timeline(slots_by_doctor, doctor_names, day_str):
+    """Merges per-doctor slot lists into {"YYYY-MM-DD HH:MM": [doctors free then]}, sorted by time."""
+    timeline = {}
+    for doctor_name in doctor_names:
+        for label in slots_by_doctor.get((doctor_name, day_str), []):
+            timeline.setdefault(label, []).append(doctor_name)
+    return OrderedDict(sorted(timeline.items()))
+
+
+def booked_minutes(busy_intervals, schedule, day, tz):
+    """Minutes of the working day already taken by appointments (overlaps counted once)."""
+    day_start = tz.localize(datetime.combine(day, schedule["start"]))
+    day_end = tz.localize(datetime.combine(day, schedule["end"]))
+    total, covered_until = 0.0, day_start
+    for start, end in sorted(busy_intervals):
+        start, end = max(start, covered_until), min(end, day_end)
+        if end > start:
+            total += (end - start).total_seconds()
+            covered_until = end
+    return int(total // 60)
+
+
+def rank_doctors(candidates, loads, first_free, policy=ASSIGNMENT_POLICY, order=None):
+    """
+    Candidates best first. least_booked: fewest booked minutes that day;
+    earliest_free: earliest first free slot. Ties keep the configured doctor order.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown assignment policy: {policy}")
+    order = list(order or DOCTORS)
+    position = {name: i for i, name in enumerate(order)}
+    if policy == "earliest_free":
+        key = lambda d: (first_free.get(d) or "~", loads.get(d, 0), position.get(d, len(order)))
+    else:
+        key = lambda d: (loads.get(d, 0), first_free.get(d) or "~", position.get(d, len(order)))
+    return sorted(candidates, key=key)
+
+
+def plan_no_preference(doctor_names, date_str, duration_minutes, policy=None, step_minutes=None, backend=None):
+    """
+    Availability of every doctor for one day from a single busy fetch, merged
+    into one timeline, with the doctor the policy assigns to each time.
+
+    Returns {"timeline": {label: [doctors]}, "assignments": {label: doctor},
+             "loads": {doctor: booked minutes}, "ranking": [doctors best first]}
+    """
+    policy = policy or ASSIGNMENT_POLICY
+    tz = pytz.timezone("Europe/Paris")
+    day = _as_date(date_str)
+    day_str = day.strftime("%Y-%m-%d")
+
+    busy = get_busy_intervals(doctor_names, [day], backend)
+    slots_by_doctor = slots_from_busy(doctor_names, [day], busy, duration_minutes, step_minutes)
+    timeline = build_slot_timeline(slots_by_doctor, doctor_names, day_str)
+
+    loads = {
+        name: booked_minutes(busy[(name, day_str)], get_doctor_schedule(name), day, tz)
+        for name in doctor_names
+    }
+    first_free = {name: (slots_by_doctor[(name, day_str)] or [None])[0] for name in doctor_names}
+    ranking = rank_doctors(doctor_names, loads, first_free, policy, order=doctor_names)
+    position = {name: i for i, name in enumerate(ranking)}
+    assignments = {label: min(doctors, key=position.get) for label, doctors in timeline.items()}
+
+    return {"timeline": timeline, "assignments": assignments, "loads": loads, "ranking": ranking}
+
+
+def find_next_available(doctor_names, duration_minutes, count=5, days=14, start_date=None, policy=None,
+                        step_minutes=None, now=None, backend=None):
+    """
+    Earliest `count` start times over the next `days` days across all doctors,
+    from one busy fetch for the whole window. Days are swept in order and each
+    day's per-doctor slot lists are merged, stopping as soon as enough are found.
+
+    Returns [{"slot": "YYYY-MM-DD HH:MM", "doctors": [...], "doctor": assigned}, ...]
+    """
+    policy = policy or ASSIGNMENT_POLICY
+    tz = pytz.timezone("Europe/Paris")
+    now = now or datetime.now(tz)
+    start_date = _as_date(start_date) if start_date else now.date()
+    window = [start_date + timedelta(days=i) for i in range(days)]
+    not_before = now.astimezone(tz).strftime("%Y-%m-%d %H:%M")
+
+    busy = get_busy_intervals(doctor_names, window, backend)
+
+    results = []
+    for day in window:
+        day_str = day.strftime("%Y-%m-%d")
+        slots_by_doctor = slots_from_busy(doctor_names, [day], busy, duration_minutes, step_minutes)
+        lists = [[(label, name) for label in slots_by_doctor[(name, day_str)] if label > not_before]
+                 for name in doctor_names]
+        if not any(lists):
+            continue
+
+        loads = {
+            name: booked_minutes(busy[(name, day_str)], get_doctor_schedule(name), day, tz)
+            for name in doctor_names
+        }
+        first_free = {name: (l[0][0] if l else None) for name, l in zip(doctor_names, lists)}
+        position = {name: i for i, name in enumerate(rank_doctors(doctor_names, loads, first_free, policy, doctor_names))}
+
+        # Labels sort chronologically, so one k-way merge gives the day's timeline
+        for label, group in groupby(heapq.merge(*lists), key=itemgetter(0)):
+            free = {name for _, name in group}
+            doctors = [name for name in doctor_names if name in free]
+            results.append({"slot": label, "doctors": doctors, "doctor": min(doctors, key=position.get)})
+            if len(results) >= count:
+                return results
+    return results
+
@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# "openai" (default) or "local" for the CPU-only hashing embeddings
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "1024"))
+# Worker processes for large document batches; 1 keeps everything in-process
+LOCAL_EMBEDDING_WORKERS = int(os.getenv("LOCAL_EMBEDDING_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Below this many texts, shipping batches to other processes costs more than it saves
+PROCESS_POOL_MIN_TEXTS = 2000
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_pools = {}   # workers -> ProcessPoolExecutor, kept for the life of the process
+_pools_lock = threading.Lock()
+
+
+def _process_pool(workers):
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # spawn, not fork: Streamlit and the sync workers run threads in this process
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[workers] = pool
+        return pool
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Offline embeddings: word unigrams/bigrams and character n-grams hashed into
+    a fixed number of dimensions, sublinear TF weighting and L2 normalisation.
+    Deterministic across processes, no model download, no network.
+
+    Documents are embedded in batches of `batch_size`. Each batch is hashed
+    once per distinct feature and counted with NumPy; inputs of at least
+    `process_min_texts` are spread over a pool of `max_workers` processes
+    (threads would not help, hashing holds the GIL).
+    """
+
+    def __init__(self, n_features=LOCAL_EMBEDDING_DIM, char_ngrams=(3, 5), batch_size=256,
+                 max_workers=LOCAL_EMBEDDING_WORKERS, process_min_texts=PROCESS_POOL_MIN_TEXTS):
+        self.n_features = n_features
+        self.char_ngrams = char_ngrams
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.process_min_texts = process_min_texts
+
+    @property
+    def model_name(self):
+        return f"local-hashing-{self.n_features}-c{self.char_ngrams[0]}{self.char_ngrams[1]}"
+
+    def _char_ngrams(self, word):
+        padded = f"<{word}>"
+        lo, hi = self.char_ngrams
+        return [padded[i:i + n] for n in range(lo, hi + 1) for i in range(len(padded) - n + 1)]
+
+    def _features(self, text, ngram_cache):
+        words = _WORD_RE.findall(text.lower())
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            ngrams = ngram_cache.get(word)
+            if ngrams is None:
+                ngrams = ngram_cache[word] = self._char_ngrams(word)
+            features.extend(ngrams)
+        return features
+
+    def _embed_batch(self, texts):
+        # Feature strings repeat heavily, so each distinct one is hashed once per batch and
+        # the counting is a single bincount
+        vocabulary, ngram_cache = {}, {}
+        feature_ids, counts = [], []
+        for text in texts:
+            features = self._features(text, ngram_cache)
+            feature_ids.extend([vocabulary.setdefault(f, len(vocabulary)) for f in features])
+            counts.append(len(features))
+
+        n = self.n_features
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in vocabulary), dtype=np.uint64,
+                             count=len(vocabulary))
+        columns = (hashes % n).astype(np.int64)
+        # A second hash bit decides the sign so collisions tend to cancel out
+        signs = np.where((hashes >> 31) & 1, 1.0, -1.0)
+
+        feature_ids = np.asarray(feature_ids, dtype=np.int64)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), counts)
+        matrix = np.bincount(rows * n + columns[feature_ids], weights=signs[feature_ids],
+                             minlength=len(texts) * n).reshape(len(texts), n).astype(np.float32)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_array(self, texts):
+        """Returns a (len(texts), n_features) float32 matrix."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.n_features), dtype=np.float32)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.max_workers > 1 and len(batches) > 1 and len(texts) >= self.process_min_texts:
+            try:
+                return np.vstack(list(_process_pool(self.max_workers).map(self._embed_batch, batches)))
+            except (BrokenProcessPool, OSError) as e:
+                print("⚠️ Embedding worker pool unavailable, embedding in-process:", e)
+        return np.vstack([self._embed_batch(b) for b in batches])
+
+    def embed_documents(self, texts):
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0].tolist()
+
+
+def get_embeddings(provider=None):
+    """
+    Returns (embeddings, model_name) for the configured provider.
+    The model name is what the vector index and embedding cache are keyed on.
+    """
+    provider = (provider or EMBEDDING_PROVIDER).lower()
+    if provider == "local":
+        embedding = HashingEmbeddings()
+        return embedding, embedding.model_name
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=OPENAI_EMBEDDING_MODEL), OPENAI_EMBEDDING_MODEL
+    raise ValueError(f"Unknown embedding provider: {provider}")
@@ -0,0 +1,158 @@
+import os
+import queue
+import threading
+from datetime import datetime, timedelta
+import gspread
+import google_auth_httplib2
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from dotenv import load_dotenv
+
+load_dotenv()
+CREDS_FILE = os.getenv("GOOGLE_CREDENTIALS_PATH")
+
+CALENDAR_SCOPES = ("https://www.googleapis.com/auth/calendar",)
+SHEETS_SCOPES = (
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive",
+)
+
+# Refresh tokens this long before they expire so requests never wait on auth
+REFRESH_MARGIN = timedelta(minutes=5)
+REFRESH_INTERVAL_SECONDS = 60
+# Idle keep-alive connections kept per API
+HTTP_POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "8"))
+
+_lock = threading.Lock()
+_credentials = {}      # scopes -> service account credentials (one per scope set)
+_discovery_docs = {}   # (api, version) -> discovery document JSON
+_gspread_client = None
+_worksheets = {}       # (sheet, worksheet) -> gspread Worksheet
+_services = {}         # api -> discovery service, shared by every thread
+_refresher = None
+
+
+# ✅ 1. Credentials: read the service-account file once per scope set
+def get_credentials(scopes):
+    scopes = tuple(scopes)
+    with _lock:
+        creds = _credentials.get(scopes)
+        if creds is None:
+            creds = service_account.Credentials.from_service_account_file(CREDS_FILE, scopes=list(scopes))
+            _credentials[scopes] = creds
+            _start_refresher()
+        return creds
+
+
+def _needs_refresh(creds):
+    if not creds.valid or creds.expiry is None:
+        return True
+    # google-auth stores expiry as a naive UTC datetime
+    return creds.expiry - datetime.utcnow() < REFRESH_MARGIN
+
+
+def _refresh_loop(stop_event):
+    request = Request()
+    while not stop_event.wait(REFRESH_INTERVAL_SECONDS):
+        with _lock:
+            pending = list(_credentials.values())
+        for creds in pending:
+            try:
+                if _needs_refresh(creds):
+                    creds.refresh(request)
+            except Exception as e:
+                # Requests still refresh on demand if the background refresh fails
+                print("Token refresh failed:", e)
+
+
+def _start_refresher():
+    global _refresher
+    if _refresher is None:
+        _refresher = threading.Event()
+        threading.Thread(target=_refresh_loop, args=(_refresher,), name="google-token-refresh", daemon=True).start()
+
+
+# ✅ 2. Discovery documents: load once, then build services offline
+def _discovery_doc(api, version):
+    key = (api, version)
+    with _lock:
+        if key not in _discovery_docs:
+            _discovery_docs[key] = get_static_doc(api, version)
+        return _discovery_docs[key]
+
+
+class HttpPool:
+    """
+    Process-wide pool of keep-alive AuthorizedHttp connections. httplib2 is
+    not thread-safe, so each request borrows an idle connection (or opens a
+    new one) and gives it back, and Streamlit reruns reuse open TLS sessions.
+    """
+
+    def __init__(self, credentials, size=HTTP_POOL_SIZE):
+        self.credentials = credentials
+        self.size = size
+        self._idle = queue.LifoQueue()
+
+    def _connection(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=30))
+
+    def request(self, *args, **kwargs):
+        http = self._connection()
+        try:
+            return http.request(*args, **kwargs)
+        finally:
+            if self._idle.qsize() < self.size:
+                self._idle.put(http)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _build_service(api, version, scopes):
+    http = HttpPool(get_credentials(scopes))
+    doc = _discovery_doc(api, version)
+    if doc is None:
+        return build(api, version, http=http, cache_discovery=False)
+    return build_from_document(doc, http=http)
+
+
+# ✅ 3. Public factories used by every page and backend module
+def get_calendar_service():
+    # Requests only share the pooled http, so one service serves every thread
+    service = _services.get("calendar")
+    if service is None:
+        service = _build_service("calendar", "v3", CALENDAR_SCOPES)
+        with _lock:
+            service = _services.setdefault("calendar", service)
+    return service
+
+
+def get_gspread_client():
+    # gspread uses a requests.Session (connection pooled, safe to share)
+    global _gspread_client
+    if _gspread_client is None:
+        client = gspread.authorize(get_credentials(SHEETS_SCOPES))
+        with _lock:
+            if _gspread_client is None:
+                _gspread_client = client
+    return _gspread_client
+
+
+def get_worksheet(sheet_name="Aesthetic_clinique", worksheet_name="clients_info"):
+    # Opening a spreadsheet costs a metadata request, so keep the handle around
+    key = (sheet_name, worksheet_name)
+    worksheet = _worksheets.get(key)
+    if worksheet is None:
+        worksheet = get_gspread_client().open(sheet_name).worksheet(worksheet_name)
+        _worksheets[key] = worksheet
+    return worksheet
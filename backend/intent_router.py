@@ -0,0 +1,167 @@
+import os
+import re
+from backend.query_analyzer import _phrase_pattern
+
+BOOKING = "booking"
+MANAGE_BOOKING = "manage_booking"
+STRUCTURED_FAQ = "structured_faq"
+SMALL_TALK = "small_talk"
+RAG = "rag"
+
+# "local" enables the nearest-example fallback for messages no phrase matches
+INTENT_CLASSIFIER = os.getenv("INTENT_CLASSIFIER", "")
+INTENT_CLASSIFIER_THRESHOLD = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", "0.5"))
+
+# Phrases per intent (EN/FR/ZH). Manage-booking wins over booking when both match
+INTENT_PHRASES = {
+    MANAGE_BOOKING: [
+        "cancel", "cancel my appointment", "cancel my booking", "reschedule", "change my appointment",
+        "move my appointment", "change my booking", "modify my booking",
+        "annuler", "annuler mon rendez-vous", "reporter", "déplacer mon rendez-vous", "modifier mon rendez-vous",
+        "取消预约", "取消", "改期", "更改预约", "修改预约",
+    ],
+    BOOKING: [
+        "book", "booking", "appointment", "consultation", "schedule", "reserve", "reservation",
+        "I'd like to come", "can I visit", "available slot", "available slots", "availability",
+        "prendre rendez-vous", "prendre un rendez-vous", "rendez-vous", "rdv", "réserver", "réservation",
+        "disponibilité", "disponibilités", "créneau",
+        "预约", "咨询", "预订", "挂号",
+    ],
+}
+
+# Small talk: (phrase, kind, language)
+SMALL_TALK_PHRASES = [
+    ("hi", "greeting", "en"), ("hello", "greeting", "en"), ("hey", "greeting", "en"),
+    ("good morning", "greeting", "en"), ("good afternoon", "greeting", "en"), ("good evening", "greeting", "en"),
+    ("thanks", "thanks", "en"), ("thank you", "thanks", "en"), ("thx", "thanks", "en"),
+    ("bye", "goodbye", "en"), ("goodbye", "goodbye", "en"), ("see you", "goodbye", "en"),
+    ("bonjour", "greeting", "fr"), ("bonsoir", "greeting", "fr"), ("salut", "greeting", "fr"),
+    ("merci", "thanks", "fr"), ("merci beaucoup", "thanks", "fr"),
+    ("au revoir", "goodbye", "fr"), ("à bientôt", "goodbye", "fr"),
+    ("你好", "greeting", "zh"), ("您好", "greeting", "zh"), ("谢谢", "thanks", "zh"),
+    ("再见", "goodbye", "zh"), ("拜拜", "goodbye", "zh"),
+]
+
+SMALL_TALK_REPLIES = {
+    ("greeting", "en"): "Hello! 👋 Ask me anything about our treatments, or tell me you'd like to book.",
+    ("greeting", "fr"): "Bonjour ! 👋 Posez-moi vos questions sur nos soins, ou dites-moi si vous souhaitez réserver.",
+    ("greeting", "zh"): "您好！👋 欢迎咨询我们的疗程，或告诉我您想预约。",
+    ("thanks", "en"): "You're welcome! 😊 Anything else I can help with?",
+    ("thanks", "fr"): "Avec plaisir ! 😊 Puis-je vous aider pour autre chose ?",
+    ("thanks", "zh"): "不客气！😊 还有什么可以帮您？",
+    ("goodbye", "en"): "Goodbye, and see you soon at the clinic! 👋",
+    ("goodbye", "fr"): "Au revoir, à bientôt à la clinique ! 👋",
+    ("goodbye", "zh"): "再见，期待在诊所见到您！👋",
+}
+
+# A message is only small talk if almost nothing is left once the pleasantries are removed
+SMALL_TALK_MAX_EXTRA_WORDS = 2
+_FILLER_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+# Example utterances for the optional local classifier
+CLASSIFIER_EXAMPLES = {
+    BOOKING: [
+        "I want to come in next week", "can I see the doctor on Friday", "do you have time tomorrow",
+        "je voudrais venir la semaine prochaine", "est-ce que je peux passer demain", "我想下周过来",
+    ],
+    MANAGE_BOOKING: [
+        "I can't make it on Tuesday", "I need another day for my visit", "something came up for my visit",
+        "je ne pourrai pas venir mardi", "我那天来不了",
+    ],
+    SMALL_TALK: [
+        "how are you", "nice to meet you", "have a nice day", "ça va", "bonne journée", "你好吗",
+    ],
+}
+
+
+class IntentClassifier:
+    """
+    Nearest-example classifier over the local hashing embeddings. Only used
+    for messages the phrase matcher could not place; anything below the
+    threshold is left to the RAG chain.
+    """
+
+    def __init__(self, examples=CLASSIFIER_EXAMPLES, threshold=INTENT_CLASSIFIER_THRESHOLD, embedding=None):
+        from backend.embeddings import HashingEmbeddings
+        self.embedding = embedding or HashingEmbeddings(n_features=512)
+        self.threshold = threshold
+        self.labels = [intent for intent, texts in examples.items() for _ in texts]
+        # Rows are L2-normalised, so a dot product is the cosine similarity
+        self.matrix = self.embedding.embed_array([t for texts in examples.values() for t in texts])
+
+    def predict(self, text):
+        """Returns (intent, score), intent being None when no example is close enough."""
+        scores = self.matrix @ self.embedding.embed_array([text])[0]
+        best = int(scores.argmax())
+        score = float(scores[best])
+        return (self.labels[best] if score >= self.threshold else None), score
+
+
+class IntentRouter:
+    """
+    Decides which handler gets a chat message, cheapest first: one compiled
+    regex pass for booking / manage-booking / small talk, then the structured
+    catalog answers, then (optionally) the local classifier, and RAG last.
+    """
+
+    def __init__(self, structured_engine=None, classifier=None):
+        self.structured_engine = structured_engine
+        self.classifier = classifier
+
+        self.phrase_to_intent = {}
+        for intent, phrases in INTENT_PHRASES.items():
+            for phrase in phrases:
+                self.phrase_to_intent.setdefault(phrase.lower(), intent)
+        self.intent_re = _phrase_pattern(self.phrase_to_intent)
+
+        self.small_talk = {phrase.lower(): (kind, lang) for phrase, kind, lang in SMALL_TALK_PHRASES}
+        self.small_talk_re = _phrase_pattern(self.small_talk)
+
+    def _small_talk(self, message):
+        matches = list(self.small_talk_re.finditer(message))
+        if not matches:
+            return None
+        rest = self.small_talk_re.sub(" ", message)
+        if len(_FILLER_RE.sub(" ", rest).split()) > SMALL_TALK_MAX_EXTRA_WORDS:
+            return None
+        kind, lang = self.small_talk[matches[-1].group(0).lower()]
+        return SMALL_TALK_REPLIES[(kind, lang)]
+
+    def route(self, message, allow_structured=True):
+        """
+        Returns (intent, answer). `answer` is the ready reply for structured_faq
+        and small_talk, None for the other intents. allow_structured=False skips
+        the catalog answers, e.g. for follow-ups that depend on the conversation.
+        """
+        intents = {self.phrase_to_intent[m.group(0).lower()] for m in self.intent_re.finditer(message)}
+        if MANAGE_BOOKING in intents:
+            return MANAGE_BOOKING, None
+        if BOOKING in intents:
+            return BOOKING, None
+
+        reply = self._small_talk(message)
+        if reply is not None:
+            return SMALL_TALK, reply
+
+        if allow_structured and self.structured_engine is not None:
+            answer = self.structured_engine.answer(message)
+            if answer is not None:
+                return STRUCTURED_FAQ, answer
+
+        if self.classifier is not None:
+            intent, _ = self.classifier.predict(message)
+            if intent == SMALL_TALK:
+                return SMALL_TALK, SMALL_TALK_REPLIES[("greeting", "en")]
+            if intent is not None:
+                return intent, None
+        return RAG, None
+
+
+def get_intent_classifier(kind=None):
+    """The optional fallback classifier selected by INTENT_CLASSIFIER, or None."""
+    kind = (kind if kind is not None else INTENT_CLASSIFIER).lower()
+    if not kind:
+        return None
+    if kind == "local":
+        return IntentClassifier()
+    raise ValueError(f"Unknown intent classifier: {kind}")
@@ -1,51 +1,79 @@
 from langchain_core.documents import Document
 import json
+from backend.catalog import get_catalog
 
-def load_documents(filepath: str):
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = json.load(f)
+# JSON field -> label used in the document text, in display order
+FIELDS = [
+    ("description", "Description"),
+    ("price", "Price"),
+    ("recommended_frequency", "Recommended frequency"),
+    ("pre_care", "Pre-care"),
+    ("post_care", "Post-care"),
+    ("effects", "Effects"),
+    ("requires_numbing_cream", "Requires numbing cream"),
+    ("makeup_after_hours", "Makeup after hours"),
+    ("post_procedure_reactions", "Post-procedure reactions"),
+    ("duration", "Duration"),
+]
 
-    docs = []
-    for i, item in enumerate(data):
-        def safe_str(value):
-            if isinstance(value, (dict, list, int, float, bool)):
-                try:
-                    return json.dumps(value, ensure_ascii=False)
-                except:
-                    return str(value)
+def safe_str(value):
+    if isinstance(value, (dict, list, int, float, bool)):
+        try:
+            return json.dumps(value, ensure_ascii=False)
+        except:
             return str(value)
+    return str(value)
+
+def format_field(item, field):
+    value = item.get(field, "")
+    if field == "price":
+        if isinstance(value, dict):
+            return "; ".join([f"{k}: {v}" for k, v in value.items()])
+        return safe_str(value if value != "" else {})
+    if field in ("pre_care", "post_care", "effects"):
+        return ", ".join(value) if isinstance(value, list) else safe_str(value)
+    if field == "duration":
+        return f"{safe_str(value)} minutes"
+    return safe_str(value)
+
+def field_metadata(item, name, field):
+    prices = item.get("price", {})
+    try:
+        duration = int(item.get("duration", 0))
+    except (TypeError, ValueError):
+        duration = 0
+    # Chroma metadata values must be scalars, so price options are joined
+    return {
+        "treatment": name,
+        "field": field,
+        "duration": duration,
+        "price_options": "; ".join(prices.keys()) if isinstance(prices, dict) else "",
+    }
+
+def load_documents(filepath: str, by_field: bool = False):
+    """
+    One document per treatment, or with by_field=True one small document per
+    treatment field (price, post-care, ...) tagged with treatment/field metadata.
+    Served from the shared catalog, so the JSON is parsed once per change.
+    """
+    return get_catalog(filepath).documents(by_field=by_field)
 
+def build_documents(data, by_field: bool = False):
+    docs = []
+    for i, item in enumerate(data):
         name = safe_str(item.get("treatment", ""))
-        desc = safe_str(item.get("description", ""))
-        prices = item.get("price", {})
-        if isinstance(prices, dict):
-            price_str = "; ".join([f"{k}: {v}" for k, v in prices.items()])
-        else:
-            price_str = safe_str(prices)
-
-        rec_freq = safe_str(item.get("recommended_frequency", ""))
-        pre_care = ", ".join(item.get("pre_care", [])) if isinstance(item.get("pre_care", []), list) else safe_str(item.get("pre_care", ""))
-        post_care = ", ".join(item.get("post_care", [])) if isinstance(item.get("post_care", []), list) else safe_str(item.get("post_care", ""))
-        effects = ", ".join(item.get("effects", [])) if isinstance(item.get("effects", []), list) else safe_str(item.get("effects", ""))
-        numbing = safe_str(item.get("requires_numbing_cream", ""))
-        makeup_after = safe_str(item.get("makeup_after_hours", ""))
-        post_proc = safe_str(item.get("post_procedure_reactions", ""))
-        duration = safe_str(item.get("duration", ""))
-
-        text = (
-            f"Treatment: {name}\n"
-            f"Description: {desc}\n"
-            f"Price: {price_str}\n"
-            f"Recommended frequency: {rec_freq}\n"
-            f"Pre-care: {pre_care}\n"
-            f"Post-care: {post_care}\n"
-            f"Effects: {effects}\n"
-            f"Requires numbing cream: {numbing}\n"
-            f"Makeup after hours: {makeup_after}\n"
-            f"Post-procedure reactions: {post_proc}\n"
-            f"Duration: {duration} minutes\n"
-        )
 
+        if by_field:
+            for field, label in FIELDS:
+                if field not in item:
+                    continue
+                text = f"Treatment: {name}\n{label}: {format_field(item, field)}\n"
+                docs.append(Document(page_content=text, metadata=field_metadata(item, name, field)))
+            continue
+
+        text = f"Treatment: {name}\n" + "".join(
+            f"{label}: {format_field(item, field)}\n" for field, label in FIELDS
+        )
         docs.append(Document(page_content=text, metadata={"treatment": name}))
 
     return docs
@@ -0,0 +1,157 @@
+import json
+import os
+from typing import Any, List, Optional
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from backend.vector_index import assign_ids
+
+NUMPY_INDEX_DIRECTORY = os.path.join("fresh_db", "numpy_index")
+VECTORS_FILE = "vectors.npy"
+MANIFEST_FILE = "manifest.json"
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class NumpyVectorStore:
+    """
+    Exact cosine-similarity search over a contiguous float32 matrix.
+    Meant for small collections like the treatment catalog, where one
+    matrix-vector product is cheaper than running an ANN index.
+    """
+
+    def __init__(self, embedding, ids, documents, hashes, matrix, embedding_model=""):
+        self.embedding = embedding
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.hashes = list(hashes)
+        self.embedding_model = embedding_model
+        self.matrix = np.ascontiguousarray(_normalize_rows(np.asarray(matrix, dtype=np.float32)))
+        self._metadata_columns = {}
+
+    # --- Persistence ---
+    def save(self, directory=NUMPY_INDEX_DIRECTORY):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, VECTORS_FILE), self.matrix)
+        manifest = {
+            "embedding_model": self.embedding_model,
+            "ids": self.ids,
+            "hashes": self.hashes,
+            "documents": [{"page_content": d.page_content, "metadata": d.metadata} for d in self.documents],
+        }
+        tmp_path = os.path.join(directory, MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(directory, MANIFEST_FILE))
+
+    @classmethod
+    def load(cls, directory, embedding):
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        vectors_path = os.path.join(directory, VECTORS_FILE)
+        if not (os.path.exists(manifest_path) and os.path.exists(vectors_path)):
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        matrix = np.load(vectors_path)
+        documents = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in manifest["documents"]]
+        return cls(embedding, manifest["ids"], documents, manifest["hashes"], matrix, manifest["embedding_model"])
+
+    # --- Search ---
+    def _metadata_column(self, key):
+        column = self._metadata_columns.get(key)
+        if column is None:
+            column = np.array([d.metadata.get(key) for d in self.documents], dtype=object)
+            self._metadata_columns[key] = column
+        return column
+
+    def _filter_mask(self, filter):
+        mask = np.ones(len(self.documents), dtype=bool)
+        for key, wanted in (filter or {}).items():
+            column = self._metadata_column(key)
+            if isinstance(wanted, (list, tuple, set)):
+                mask &= np.isin(column, list(wanted))
+            else:
+                mask &= column == wanted
+        return mask
+
+    def similarity_search_by_vector_with_score(self, vector, k=4, filter=None):
+        if not self.documents:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = self.matrix @ (query / norm if norm else query)
+
+        candidates = np.arange(len(self.documents))
+        if filter:
+            candidates = candidates[self._filter_mask(filter)]
+            scores = scores[candidates]
+        if candidates.size == 0:
+            return []
+
+        k = min(k, candidates.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[candidates[i]], float(scores[i])) for i in top]
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def as_retriever(self, search_kwargs=None):
+        search_kwargs = search_kwargs or {}
+        return NumpyRetriever(store=self, k=search_kwargs.get("k", 4), filter=search_kwargs.get("filter"))
+
+
+class NumpyRetriever(BaseRetriever):
+    store: Any
+    k: int = 4
+    filter: Optional[dict] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.store.similarity_search(query, k=self.k, filter=self.filter)
+
+
+def build_numpy_index(docs, embedding, embedding_model, directory=NUMPY_INDEX_DIRECTORY):
+    """
+    Loads the saved matrix, reuses vectors whose content hash is unchanged,
+    embeds the rest and saves again only if something changed.
+    """
+    entries = assign_ids(docs)
+    previous = NumpyVectorStore.load(directory, embedding)
+    reusable = {}
+    if previous is not None and previous.embedding_model == embedding_model:
+        reusable = {
+            doc_id: previous.matrix[i]
+            for i, (doc_id, h) in enumerate(zip(previous.ids, previous.hashes))
+            if doc_id in entries and entries[doc_id][1] == h
+        }
+
+    ids = list(entries)
+    to_embed = [doc_id for doc_id in ids if doc_id not in reusable]
+    fresh = {}
+    if to_embed:
+        vectors = embedding.embed_documents([entries[doc_id][0].page_content for doc_id in to_embed])
+        fresh = dict(zip(to_embed, np.asarray(vectors, dtype=np.float32)))
+
+    dim = next(iter(reusable.values()), next(iter(fresh.values()), np.zeros(0))).shape[0]
+    matrix = np.zeros((len(ids), dim), dtype=np.float32)
+    for row, doc_id in enumerate(ids):
+        matrix[row] = reusable[doc_id] if doc_id in reusable else fresh[doc_id]
+
+    store = NumpyVectorStore(
+        embedding, ids, [entries[i][0] for i in ids], [entries[i][1] for i in ids], matrix, embedding_model
+    )
+    if to_embed or previous is None or previous.ids != ids:
+        store.save(directory)
+    print(f"🗂️ NumPy index ready: {len(to_embed)} embedded, {len(reusable)} reused")
+    return store
@@ -1,20 +1,46 @@
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_core.chat_history import InMemoryChatMessageHistory
 from langchain_core.documents import Document
 from openai import OpenAI
 import json
-import chromadb
+import os
+from backend.embedding_cache import CachedEmbeddings, get_embedding_cache
+from backend.embeddings import get_embeddings
+from backend.chat_history import SessionHistoryStore
+from backend.context_packer import context_budget, pack_context
+from backend.tokens import count_tokens
+from backend.bm25 import BM25Index, HybridRetriever
+from backend.query_analyzer import QueryAnalyzer, vector_search
 
-# Session-based memory store
-chat_histories = {}
+# "chroma" (persisted HNSW collection) or "numpy" (exact search, no chromadb import)
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "chroma")
+# BM25 + vector fusion with a tighter top-k (set HYBRID_RETRIEVAL=0 for vectors only, k=8)
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") != "0"
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
 
-# Build a retrieval-augmented QA chain with memory
-def build_qa_chain(docs):
+# Session-based memory store: token-windowed per session, idle sessions evicted,
+# optionally persisted to SQLite (CHAT_HISTORY_DB)
+history_store = SessionHistoryStore()
+
+def get_session_history(session_id):
+    return history_store.get(session_id)
+
+# Record a turn answered outside the chain (e.g. from the answer cache) so follow-ups keep context
+def record_exchange(session_id, question, answer):
+    history = get_session_history(session_id)
+    history.add_user_message(question)
+    history.add_ai_message(answer)
+
+# Embeddings for the configured provider, behind the persistent embedding cache
+def get_cached_embeddings():
+    base_embedding, embedding_model = get_embeddings()
+    return CachedEmbeddings(base_embedding, embedding_model, get_embedding_cache()), embedding_model
+
+# Build a retrieval-augmented QA chain with memory (llm defaults to ChatOpenAI)
+def build_qa_chain(docs, llm=None):
     # Step 1: Clean and validate document contents
     clean_docs = []
     for i, d in enumerate(docs):
@@ -30,16 +56,36 @@ def build_qa_chain(docs):
     if not clean_docs:
         raise ValueError("❌ No valid documents found to embed.")
 
-    # Step 2: Create vectorstore with OpenAI embeddings
-    embedding = OpenAIEmbeddings(model="text-embedding-3-small")
-    vectorstore = Chroma.from_documents(
-        clean_docs,
-        embedding=embedding,
-        collection_name="aesthetic_collection",
-        persist_directory="fresh_db",  
-        client_settings=chromadb.config.Settings(anonymized_telemetry=False)
-    )
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 8})
+    # Step 2: Sync the persisted vectorstore, embedding only new or changed documents
+    # (provider comes from EMBEDDING_PROVIDER: OpenAI by default, "local" for offline use)
+    # Repeated questions and unchanged documents are served from the on-disk cache
+    embedding, embedding_model = get_cached_embeddings()
+    if RETRIEVER_MODE == "numpy":
+        from backend.numpy_retriever import build_numpy_index
+        vectorstore = build_numpy_index(clean_docs, embedding, embedding_model)
+    else:
+        from backend.vector_index import build_vector_index
+        vectorstore = build_vector_index(clean_docs, embedding, embedding_model)
+    # Exact tokens ("Nefertiti", "1ml") come from BM25, paraphrases from the vectors;
+    # fusing both lets us send fewer, better documents to the LLM
+    if HYBRID_RETRIEVAL:
+        retriever = HybridRetriever(vectorstore=vectorstore, bm25=BM25Index(clean_docs), k=RETRIEVAL_K)
+        search = retriever.search
+    else:
+        search = lambda question, filter: vector_search(vectorstore, question, 8, filter)
+
+    # Narrow retrieval to the treatments/fields the question mentions (e.g. Botox + post_care),
+    # falling back to an unfiltered search when the filter matches nothing
+    analyzer = QueryAnalyzer(sorted({d.metadata.get("treatment", "") for d in clean_docs} - {""}))
+    metadata_keys = {key for d in clean_docs for key in d.metadata}
+
+    def retrieve(question):
+        filter = analyzer.build_filter(question, metadata_keys)
+        if filter:
+            docs = search(question, filter)
+            if docs:
+                return docs
+        return search(question, None)
 
     # Step 3: Define chat prompt with context and memory placeholder
     prompt = ChatPromptTemplate.from_messages([
@@ -53,29 +99,35 @@ def build_qa_chain(docs):
         ("human", "{question}")
     ])
 
-    # Step 4: Define how to pass full inputs to the prompt
-    def format_docs(docs):
-        return "\n\n".join(doc.page_content for doc in docs)
-
+    # Step 4: Define how to pass full inputs to the prompt.
+    # Context is packed into whatever token budget the history leaves free.
     def build_inputs(inputs):
+        question = inputs["question"]
+        history = inputs.get("history", [])
+        history_tokens = sum(count_tokens(str(m.content)) for m in history)
+        question_tokens = count_tokens(question)
+        context, report = pack_context(retrieve(question), context_budget(history_tokens, question_tokens))
+        print(f"🧮 Prompt tokens: context={report['context_tokens']}/{report['budget']} "
+              f"history={history_tokens} question={question_tokens} "
+              f"(lines kept {report['lines_kept']}, trimmed {report['lines_trimmed']}, dropped {report['lines_dropped']})")
         return {
-            "context": format_docs(retriever.invoke(inputs["question"])),
-            "question": inputs["question"],
-            "history": inputs.get("history", [])
+            "context": context,
+            "question": question,
+            "history": history
         }
 
     # Step 5: Create the base chain
     chain = (
         RunnableLambda(build_inputs)
         | prompt
-        | ChatOpenAI(temperature=0)
+        | (llm or ChatOpenAI(temperature=0))
         | StrOutputParser()
     )
 
     # Step 6: Add per-session chat history memory
     final_chain = RunnableWithMessageHistory(
         chain,
-        lambda session_id: chat_histories.setdefault(session_id, InMemoryChatMessageHistory()),
+        get_session_history,
         input_messages_key="question",
         history_messages_key="history",
     )
@@ -0,0 +1,121 @@
+import re
+
+# Phrases that point a question at specific treatment fields (EN/FR/ZH)
+FIELD_INTENTS = {
+    "price": ["price", "prices", "cost", "costs", "how much", "expensive", "cheap", "fee", "€", "euro",
+              "prix", "tarif", "combien", "价格", "多少钱", "费用"],
+    "duration": ["how long", "duration", "minutes", "take long", "durée", "combien de temps", "多久", "多长时间"],
+    "recommended_frequency": ["how often", "frequency", "repeat", "top up", "top-up", "every how",
+                              "fréquence", "多久做一次"],
+    "pre_care": ["before", "prepare", "preparation", "pre-care", "pre care", "prior", "avant", "术前", "之前"],
+    "post_care": ["after", "aftercare", "after-care", "post-care", "post care", "afterwards", "recovery",
+                  "après", "术后", "之后"],
+    "makeup_after_hours": ["makeup", "make-up", "make up", "maquillage", "化妆"],
+    "effects": ["effect", "effects", "benefit", "benefits", "result", "results", "does it do", "work for",
+                "résultat", "效果"],
+    "requires_numbing_cream": ["numbing", "pain", "painful", "hurt", "hurts", "anaesthetic", "anesthetic",
+                               "douleur", "疼", "痛"],
+    "post_procedure_reactions": ["side effect", "side effects", "swelling", "redness", "bruising", "reaction",
+                                 "downtime", "effets secondaires", "副作用"],
+    "description": ["what is", "what's", "explain", "qu'est-ce", "是什么"],
+}
+
+# Extra names patients use for catalog treatments
+TREATMENT_SYNONYMS = {
+    "Botox": ["botulinum", "anti-wrinkle injections", "wrinkle injections"],
+    "Dermal Fillers": ["filler", "fillers", "lip filler", "cheek filler"],
+    "Ultrasound HIFU (High-Intensity Focused Ultrasound)": ["hifu"],
+    "Teeth Whitening (LED Cool Light)": ["teeth whitening", "whitening"],
+    "IPL Photofacial (Intense Pulsed Light)": ["ipl", "photofacial"],
+    "Laser Hair Removal": ["hair removal"],
+    "Laser Pigmentation Removal": ["pigmentation", "dark spots"],
+}
+
+
+def treatment_aliases(name):
+    """Lowercase aliases for a treatment: full name, name without the parenthesis, its content."""
+    aliases = {name.lower()}
+    match = re.match(r"^(.*?)\s*\((.*)\)\s*$", name)
+    if match:
+        aliases.update({match.group(1).lower(), match.group(2).lower()})
+    aliases.update(s.lower() for s in TREATMENT_SYNONYMS.get(name, []))
+    return {a.strip() for a in aliases if a.strip()}
+
+
+def _phrase_pattern(phrases):
+    # Longest first so "side effects" wins over "effects"; word boundaries only around word characters
+    parts = []
+    for phrase in sorted(phrases, key=len, reverse=True):
+        escaped = re.escape(phrase)
+        if phrase[:1].isalnum() and phrase[:1].isascii():
+            escaped = r"\b" + escaped
+        if phrase[-1:].isalnum() and phrase[-1:].isascii():
+            escaped = escaped + r"\b"
+        parts.append(escaped)
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+class QueryAnalyzer:
+    """Detects treatment names and field intents in a question, in one regex pass each."""
+
+    def __init__(self, treatment_names):
+        self.alias_to_treatment = {}
+        for name in treatment_names:
+            for alias in treatment_aliases(name):
+                self.alias_to_treatment.setdefault(alias, name)
+        self.treatment_re = _phrase_pattern(self.alias_to_treatment) if self.alias_to_treatment else None
+
+        self.phrase_to_field = {}
+        for field, phrases in FIELD_INTENTS.items():
+            for phrase in phrases:
+                self.phrase_to_field.setdefault(phrase.lower(), field)
+        self.field_re = _phrase_pattern(self.phrase_to_field)
+
+    def analyze(self, question):
+        treatments, fields = [], []
+        if self.treatment_re:
+            for match in self.treatment_re.finditer(question):
+                name = self.alias_to_treatment[match.group(0).lower()]
+                if name not in treatments:
+                    treatments.append(name)
+        for match in self.field_re.finditer(question):
+            field = self.phrase_to_field[match.group(0).lower()]
+            if field not in fields:
+                fields.append(field)
+        return {"treatments": treatments, "fields": fields}
+
+    def signature(self, question):
+        """Hashable summary of what a question is about, used to keep cached answers apart."""
+        analysis = self.analyze(question)
+        return frozenset(analysis["treatments"]), frozenset(analysis["fields"])
+
+    def build_filter(self, question, available_keys=("treatment", "field")):
+        """
+        Metadata filter such as {"treatment": ["Botox"], "field": ["post_care"]},
+        or None when the question names neither a treatment nor a field.
+        """
+        analysis = self.analyze(question)
+        filter = {}
+        if analysis["treatments"] and "treatment" in available_keys:
+            filter["treatment"] = analysis["treatments"]
+        if analysis["fields"] and "field" in available_keys:
+            filter["field"] = analysis["fields"]
+        return filter or None
+
+
+def vector_search(vectorstore, query, k, filter=None):
+    """similarity_search on either a Chroma or a NumPy store, translating the filter for Chroma."""
+    if filter and hasattr(vectorstore, "_collection"):
+        return vectorstore.similarity_search(query, k=k, filter=to_chroma_filter(filter))
+    return vectorstore.similarity_search(query, k=k, filter=filter)
+
+
+def to_chroma_filter(filter):
+    """Translates {"key": [values]} into Chroma's where-clause syntax."""
+    if not filter:
+        return None
+    clauses = [
+        {key: {"$in": list(values)} if isinstance(values, (list, tuple, set)) else values}
+        for key, values in filter.items()
+    ]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
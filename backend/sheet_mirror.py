@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from gspread.utils import numericise_all, to_records
+from backend.google_clients import get_worksheet
+
+SHEET_MIRROR_DB = os.getenv("SHEET_MIRROR_DB", "clients_info_mirror.sqlite3")
+# Reads accept data at most this old before syncing first
+SHEET_MIRROR_MAX_STALENESS = int(os.getenv("SHEET_MIRROR_MAX_STALENESS", "15"))
+# Rows per range of the single batch_get a sync sends
+SYNC_BATCH_ROWS = 1000
+
+# Indexed columns: mirror column -> sheet header
+INDEXED_COLUMNS = {
+    "event_id": "eventId",
+    "booking_id": "booking_id",
+    "email": "email",
+    "doctor": "doctor",
+    "date": "date",
+}
+
+
+class SheetMirror:
+    """
+    SQLite copy of the clients_info sheet with indexes on eventId, booking_id,
+    email, doctor and date. Reads go through the mirror and only sync when it
+    is older than `max_staleness_seconds`; an optional background thread keeps
+    it fresh so page loads rarely wait on Sheets.
+
+    A sync costs one metadata request when the Drive revision is unchanged.
+    When it changed (appends, edits, deletions), or every
+    `full_reload_seconds`, the sheet is read with one `batch_get` and diffed
+    against a hash of every mirrored row, so only changed rows are written.
+    Sheets is read without holding the lock; lookups only wait for the short
+    SQLite write. The file can be shared by several app processes.
+    """
+
+    def __init__(self, db_path=SHEET_MIRROR_DB, worksheet_factory=get_worksheet,
+                 max_staleness_seconds=SHEET_MIRROR_MAX_STALENESS, full_reload_seconds=300,
+                 batch_rows=SYNC_BATCH_ROWS, clock=time.time):
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.worksheet_factory = worksheet_factory
+        self.max_staleness_seconds = max_staleness_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.batch_rows = batch_rows
+        self.clock = clock
+        self._lock = threading.RLock()       # SQLite connection
+        self._sync_lock = threading.Lock()   # one sync at a time, lookups are not blocked by it
+        self._worker = None
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        if db_path != ":memory:":
+            # Readers in other processes are not blocked while a sync writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS clients_info ("
+            " row_number INTEGER PRIMARY KEY, event_id TEXT, booking_id TEXT, email TEXT,"
+            " doctor TEXT, date TEXT, data TEXT NOT NULL, row_hash TEXT)"
+        )
+        if "row_hash" not in [c[1] for c in self._conn.execute("PRAGMA table_info(clients_info)")]:
+            # Mirrors created before row diffs: rows without a hash are rewritten by the next sync
+            self._conn.execute("ALTER TABLE clients_info ADD COLUMN row_hash TEXT")
+        for column in INDEXED_COLUMNS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS clients_info_{column} ON clients_info ({column})")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    # --- Sync state ---
+    def _meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM sync_meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, **values):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)",
+            [(k, json.dumps(v)) for k, v in values.items()],
+        )
+
+    def _row_count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM clients_info").fetchone()[0]
+
+    def last_sync(self):
+        with self._lock:
+            return self._meta("last_sync")
+
+    # --- Loading ---
+    @staticmethod
+    def _row_hash(values):
+        return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _records(self, headers, rows):
+        """[(row_number, row_hash, values)] -> clients_info rows."""
+        records = to_records(headers, [numericise_all(values) for _, _, values in rows])
+        out = []
+        for (row_number, row_hash, _), record in zip(rows, records):
+            indexed = [str(record.get(header) or "").strip() for header in INDEXED_COLUMNS.values()]
+            # Only the day is indexed for "date" (the sheet stores "YYYY-MM-DD HH:MM")
+            indexed[4] = indexed[4][:10]
+            indexed[2] = indexed[2].lower()
+            out.append([row_number] + indexed + [json.dumps(record, ensure_ascii=False, default=str), row_hash])
+        return out
+
+    def _fetch(self, worksheet, row_count):
+        """Every used row in one batch_get, split in ranges of `batch_rows` rows. Returns (headers, rows)."""
+        ranges = [f"{start}:{min(row_count, start + self.batch_rows - 1)}"
+                  for start in range(1, row_count + 1, self.batch_rows)]
+        values = [row for value_range in worksheet.batch_get(ranges) for row in value_range] if ranges else []
+        headers = values[0] if values else []
+        width = len(headers)
+        # The API omits trailing empty cells; pad so every row hashes the same way as before
+        rows = [(list(row) + [""] * (width - len(row)))[:width] for row in values[1:]]
+        return headers, rows
+
+    def _apply(self, headers, rows, revision, now, full):
+        """Writes the rows whose hash changed and drops rows past the end of the sheet."""
+        with self._lock:
+            if headers != self._meta("headers"):
+                stored = {}
+            else:
+                stored = dict(self._conn.execute("SELECT row_number, row_hash FROM clients_info"))
+        # Sheet row numbers are 1-based and row 1 holds the headers
+        changed = []
+        for row_number, values in enumerate(rows, start=2):
+            row_hash = self._row_hash(values)
+            if stored.get(row_number) != row_hash:
+                changed.append((row_number, row_hash, values))
+        records = self._records(headers, changed)
+
+        meta = {"headers": headers, "revision": revision, "last_sync": now}
+        if full:
+            meta["last_full_load"] = now
+        # One transaction: readers see either the old or the new copy, never half of it
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM clients_info WHERE row_number > ?", (len(rows) + 1,))
+            if not stored:
+                self._conn.execute("DELETE FROM clients_info")
+            self._conn.executemany("INSERT OR REPLACE INTO clients_info VALUES (?, ?, ?, ?, ?, ?, ?, ?)", records)
+            self._set_meta(**meta)
+        return len(records)
+
+    def _touch(self, now):
+        with self._lock, self._conn:
+            self._set_meta(last_sync=now)
+
+    def _revision_of(self, worksheet):
+        try:
+            return worksheet.spreadsheet.get_lastUpdateTime()
+        except Exception as e:
+            print("Could not read sheet revision:", e)
+            return None
+
+    def sync(self, force=False):
+        """
+        Brings the mirror up to date. Without `force`, does nothing while the
+        mirror is younger than the staleness bound (whichever process synced it).
+        """
+        with self._sync_lock:
+            now = self.clock()
+            with self._lock:
+                last_sync = self._meta("last_sync")
+                last_full_load = self._meta("last_full_load")
+                mirrored_revision = self._meta("revision")
+                mirrored_rows = self._row_count()
+            if not force and last_sync is not None and now - last_sync < self.max_staleness_seconds:
+                return
+
+            # Network reads below run without self._lock, so lookups keep answering from SQLite
+            worksheet = self.worksheet_factory()
+            revision = self._revision_of(worksheet)
+            stale = last_full_load is None or now - last_full_load >= self.full_reload_seconds
+            if not stale and revision is not None and revision == mirrored_revision:
+                self._touch(now)
+                return
+            # Column A is always filled, so its length is the number of used rows
+            row_count = len(worksheet.col_values(1))
+            if not stale and revision is None and row_count == mirrored_rows + 1:
+                # Edits can't be told apart without a revision; wait for the periodic reload
+                self._touch(now)
+                return
+            headers, rows = self._fetch(worksheet, row_count)
+            self._apply(headers, rows, revision, now, full=stale)
+
+    def _run(self, interval):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print("⚠️ Sheet mirror sync failed:", e)
+            time.sleep(interval)
+
+    def start(self, interval=None):
+        """Starts the background syncer once per mirror."""
+        with self._lock:
+            if self._worker is None:
+                interval = interval or max(1, self.max_staleness_seconds)
+                self._worker = threading.Thread(target=self._run, args=(interval,), name="sheet-mirror", daemon=True)
+                self._worker.start()
+        return self
+
+    # --- Queries ---
+    def _select(self, where="", params=()):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT data FROM clients_info {where} ORDER BY row_number", params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def _query(self, where, params, retry_on_miss=True):
+        self.sync()
+        rows = self._select(where, params)
+        if not rows and retry_on_miss:
+            # A row that n8n wrote seconds ago may not be mirrored yet
+            self.sync(force=True)
+            rows = self._select(where, params)
+        return rows
+
+    def _first(self, column, key):
+        key = str(key or "").strip()
+        if not key:
+            return None
+        rows = self._query(f"WHERE {column} = ?", (key,))
+        # Keep the first match, like the previous linear scans did
+        return rows[0] if rows else None
+
+    def by_event_id(self, event_id):
+        return self._first("event_id", event_id)
+
+    def by_booking_id(self, booking_id):
+        return self._first("booking_id", booking_id)
+
+    def by_event_ids(self, event_ids):
+        """Returns {event_id: row} for the ids found, syncing at most twice for the whole batch."""
+        keys = sorted({str(e or "").strip() for e in event_ids} - {""})
+        if not keys:
+            return {}
+
+        def lookup():
+            found = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                where = f"WHERE event_id IN ({','.join('?' * len(chunk))})"
+                for row in self._select(where, chunk):
+                    found.setdefault(str(row.get("eventId")).strip(), row)
+            return found
+
+        self.sync()
+        found = lookup()
+        if len(found) < len(keys):
+            self.sync(force=True)
+            found = lookup()
+        return found
+
+    def by_email(self, email):
+        return self._query("WHERE email = ?", (str(email or "").strip().lower(),), retry_on_miss=False)
+
+    def by_doctor_and_date(self, doctor, date):
+        """Rows for a doctor on a day ("YYYY-MM-DD" or a date)."""
+        day = date if isinstance(date, str) else date.strftime("%Y-%m-%d")
+        return self._query("WHERE doctor = ? AND date = ?", (doctor, day[:10]), retry_on_miss=False)
+
+    def all_rows(self):
+        self.sync()
+        return self._select()
+
+
+# One mirror per process, shared by the booking pages and the dashboard
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_sheet_mirror():
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = SheetMirror().start()
+        return _mirror
@@ -1,36 +1,42 @@
-from dotenv import load_dotenv
-import os
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-
-load_dotenv()
-
-# Set up Google Sheets access
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-CREDS_FILE = os.getenv("GOOGLE_CREDENTIALS_PATH")
-
-credentials = ServiceAccountCredentials.from_json_keyfile_name(CREDS_FILE, SCOPE)
-client = gspread.authorize(credentials)
+from backend.google_clients import get_worksheet as _get_shared_worksheet
+from backend.sheet_mirror import get_sheet_mirror
 
 # Change this to your actual sheet name
 def get_worksheet(sheet_name="Aesthetic_clinique", worksheet_name="clients_info"):
-    sheet = client.open(sheet_name)
-    return sheet.worksheet(worksheet_name)
+    return _get_shared_worksheet(sheet_name, worksheet_name)
 
 def find_appointment_by_event_id(event_id):
     """
     Returns the first row (as a dict) matching the given event_id, or None if not found.
     """
-    worksheet = get_worksheet()
-    records = worksheet.get_all_records()
+    return get_sheet_mirror().by_event_id(event_id)
+
+def find_appointment_by_booking_id(booking_id):
+    """
+    Returns the first row (as a dict) matching the given booking_id, or None if not found.
+    """
+    return get_sheet_mirror().by_booking_id(booking_id)
+
+def find_appointments_by_event_ids(event_ids):
+    """
+    Returns {event_id: row} for every given event_id present in the sheet,
+    with one indexed query for the whole batch.
+    """
+    return get_sheet_mirror().by_event_ids(event_ids)
 
-    for row in records:
-        if str(row.get("eventId")) == str(event_id):
-            return row
-    return None
+def find_appointments_by_email(email):
+    """
+    Returns every row for the given email (case-insensitive), oldest first.
+    """
+    return get_sheet_mirror().by_email(email)
+
+def find_appointments_for_doctor_day(doctor, date):
+    """
+    Returns every row booked with `doctor` on `date` ("YYYY-MM-DD" or a date).
+    """
+    return get_sheet_mirror().by_doctor_and_date(doctor, date)
 
 # Optional: get all rows
 
 def get_all_appointments():
-    worksheet = get_worksheet()
-    return worksheet.get_all_records()
+    return get_sheet_mirror().all_rows()
@@ -0,0 +1,117 @@
+import re
+from backend.query_analyzer import QueryAnalyzer
+
+# Only these fields are answered straight from the catalog
+STRUCTURED_FIELDS = {"price", "duration", "recommended_frequency"}
+# Longer questions usually ask more than we can answer from a single field
+MAX_QUESTION_WORDS = 16
+
+_NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+    "a single": "1", "un": "1", "une": "1", "deux": "2", "trois": "3", "quatre": "4",
+}
+_NUMBER_WORDS_RE = re.compile(r"\b(" + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + r")\b")
+
+# "How long" is only answered from the session duration when it is about the session itself;
+# how long results last is left to the RAG chain (matched as word prefixes: "takes", "lasts")
+SESSION_TERMS = ["take", "took", "session", "appointment", "procedure", "séance", "rendez-vous", "prend",
+                 "治疗时间", "做一次"]
+LASTING_TERMS = ["last", "result", "until", "effect", "wear off", "downtime", "recover", "heal", "résultat",
+                 "effet", "tenir", "tient", "维持", "效果", "持续"]
+
+
+def _terms_re(terms):
+    # \b never fires between CJK characters, so those terms match anywhere
+    cjk = [re.escape(t) for t in terms if re.search(r"[\u4e00-\u9fff]", t)]
+    words = [re.escape(t) for t in terms if not re.search(r"[\u4e00-\u9fff]", t)]
+    return re.compile(r"\b(?:" + "|".join(words) + ")|" + "|".join(cjk))
+
+
+_SESSION_RE = _terms_re(SESSION_TERMS)
+_LASTING_RE = _terms_re(LASTING_TERMS)
+
+
+def normalize_option(text):
+    """'Two Areas' -> '2 areas', '1 ml' -> '1ml' so price keys match how people type them."""
+    text = _NUMBER_WORDS_RE.sub(lambda m: _NUMBER_WORDS[m.group(1)], text.lower())
+    text = re.sub(r"(\d)\s+(ml)\b", r"\1\2", text)
+    return " ".join(re.findall(r"[\w+]+", text))
+
+
+def option_tokens(text):
+    """Normalized tokens with plurals folded, so 'cheek filler 1 ml' covers 'Cheek fillers 1ml'."""
+    return {t[:-1] if len(t) > 3 and t.endswith("s") and not t.endswith("ss") else t
+            for t in normalize_option(text).split()}
+
+
+class StructuredAnswerEngine:
+    """
+    Answers price, duration and frequency questions about a single treatment
+    directly from the catalog. Returns None whenever it is not confident, so
+    the caller can fall through to the RAG chain.
+    """
+
+    def __init__(self, treatments):
+        self.treatments = {t["treatment"]: t for t in treatments}
+        self.analyzer = QueryAnalyzer(list(self.treatments))
+
+    def _match_options(self, name, prices, question):
+        """
+        Price options whose tokens all appear in the question, longest first
+        wins. None when the question also names part of a longer option (e.g.
+        "cheek ... 1ml" without "filler"), rather than quote the wrong price.
+        """
+        asked = option_tokens(question)
+        tokens = {option: option_tokens(option) for option in prices}
+        matches = [option for option in prices if tokens[option] <= asked]
+        # "Cheek fillers 1ml" should win over "1ml" when both match
+        matches = [m for m in matches if not any(tokens[m] < tokens[o] for o in matches)]
+        name_tokens = option_tokens(name)
+        for option in prices:
+            if option in matches:
+                continue
+            extra = tokens[option] - name_tokens
+            if any(tokens[m] < tokens[option] and (extra - tokens[m]) & asked for m in matches):
+                return None
+        return matches
+
+    def _price_answer(self, name, price, question):
+        if isinstance(price, dict) and price:
+            options = self._match_options(name, price, question)
+            if options is None:
+                return None
+            lines = "\n".join(f"- {option}: {price[option]}" for option in options or price)
+            return f"{name} prices:\n{lines}"
+        if price:
+            return f"{name} price: {price}."
+        return None
+
+    def _duration_answer(self, name, duration, question):
+        text = question.lower()
+        if not duration or _LASTING_RE.search(text) or not _SESSION_RE.search(text):
+            return None
+        return f"A {name} session takes about {duration} minutes."
+
+    def answer(self, question):
+        if len(question.split()) > MAX_QUESTION_WORDS:
+            return None
+        analysis = self.analyzer.analyze(question)
+        fields = set(analysis["fields"])
+        if len(analysis["treatments"]) != 1 or not fields or not fields <= STRUCTURED_FIELDS:
+            return None
+
+        name = analysis["treatments"][0]
+        item = self.treatments[name]
+        parts = []
+        if "price" in fields:
+            parts.append(self._price_answer(name, item.get("price"), question))
+        if "duration" in fields:
+            parts.append(self._duration_answer(name, item.get("duration"), question))
+        if "recommended_frequency" in fields:
+            frequency = item.get("recommended_frequency")
+            parts.append(f"Recommended frequency for {name}: {frequency}." if frequency else None)
+
+        # Any missing value means the catalog can't answer everything that was asked
+        if not parts or any(p is None for p in parts):
+            return None
+        return "\n\n".join(parts)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import re
+
+PERSIST_DIRECTORY = "fresh_db"
+COLLECTION_NAME = "aesthetic_collection"
+MANIFEST_NAME = "index_manifest.json"
+
+
+def document_id(doc):
+    """
+    Stable id built from the document's metadata, e.g. "botox" or
+    "botox:post_care" for field-level chunks.
+    """
+    parts = [doc.metadata.get("treatment", "")]
+    for key in ("field", "chunk"):
+        if doc.metadata.get(key) not in (None, ""):
+            parts.append(str(doc.metadata[key]))
+    return ":".join(re.sub(r"[^a-z0-9]+", "_", str(p).lower()).strip("_") for p in parts)
+
+
+def content_hash(doc):
+    payload = json.dumps(
+        {"text": doc.page_content, "metadata": doc.metadata}, sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def assign_ids(docs):
+    """Returns {id: (doc, hash)}; repeated ids get a numeric suffix in document order."""
+    entries, seen = {}, {}
+    for doc in docs:
+        base = document_id(doc) or "doc"
+        seen[base] = seen.get(base, 0) + 1
+        doc_id = base if seen[base] == 1 else f"{base}~{seen[base]}"
+        entries[doc_id] = (doc, content_hash(doc))
+    return entries
+
+
+def load_manifest(persist_directory):
+    path = os.path.join(persist_directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(persist_directory, manifest):
+    os.makedirs(persist_directory, exist_ok=True)
+    path = os.path.join(persist_directory, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan_sync(manifest, entries, embedding_model):
+    """
+    Compares the stored manifest with the current documents.
+    Returns (ids_to_delete, ids_to_embed).
+    """
+    stored = {}
+    if manifest and manifest.get("embedding_model") == embedding_model:
+        stored = manifest.get("documents", {})
+    to_delete = [doc_id for doc_id, h in stored.items() if entries.get(doc_id, (None, None))[1] != h]
+    to_embed = [doc_id for doc_id, (_, h) in entries.items() if stored.get(doc_id) != h]
+    return to_delete, to_embed
+
+
+def build_vector_index(docs, embedding, embedding_model, persist_directory=PERSIST_DIRECTORY,
+                       collection_name=COLLECTION_NAME):
+    """
+    Opens the persisted Chroma collection and brings it in line with `docs`,
+    embedding only new or changed documents and deleting removed ones.
+    When nothing changed no embedding request is made.
+    """
+    # Imported here so the NumPy retriever mode never loads chromadb
+    import chromadb
+    from langchain_community.vectorstores import Chroma
+
+    vectorstore = Chroma(
+        collection_name=collection_name,
+        embedding_function=embedding,
+        persist_directory=persist_directory,
+        client_settings=chromadb.config.Settings(anonymized_telemetry=False),
+    )
+
+    entries = assign_ids(docs)
+    manifest = load_manifest(persist_directory)
+    to_delete, to_embed = plan_sync(manifest, entries, embedding_model)
+
+    if manifest is None or manifest.get("embedding_model") != embedding_model:
+        # Collections written before the manifest existed hold duplicates under random ids
+        to_delete = vectorstore.get(include=[])["ids"]
+
+    if to_delete:
+        vectorstore.delete(ids=to_delete)
+    if to_embed:
+        vectorstore.add_documents([entries[i][0] for i in to_embed], ids=to_embed)
+
+    save_manifest(persist_directory, {
+        "collection": collection_name,
+        "embedding_model": embedding_model,
+        "documents": {doc_id: h for doc_id, (_, h) in entries.items()},
+    })
+    print(f"🗂️ Vector index synced: {len(to_embed)} embedded, {len(to_delete)} deleted, "
+          f"{len(entries) - len(to_embed)} reused")
+    return vectorstore
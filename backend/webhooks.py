@@ -0,0 +1,322 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import requests
+from requests.adapters import HTTPAdapter
+from backend.calendar_utils import invalidate_availability
+
+# (connect, read) seconds; a slow n8n instance must never block a Streamlit run
+WEBHOOK_TIMEOUT = (3.05, float(os.getenv("WEBHOOK_READ_TIMEOUT", "10")))
+WEBHOOK_MAX_RETRIES = int(os.getenv("WEBHOOK_MAX_RETRIES", "3"))
+WEBHOOK_BACKOFF_BASE = 0.5
+WEBHOOK_BACKOFF_CAP = 60.0
+WEBHOOK_OUTBOX_DB = os.getenv("WEBHOOK_OUTBOX_DB", "webhook_outbox.sqlite3")
+# Outbox deliveries give up after this many attempts and are marked "failed"
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_OUTBOX_MAX_ATTEMPTS", "8"))
+# A claimed row is retried by any worker once its lease runs out (e.g. after a crash)
+OUTBOX_LEASE_SECONDS = 60
+OUTBOX_BACKOFF_BASE = 2.0
+OUTBOX_BACKOFF_CAP = 600.0
+
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+_IDEMPOTENCY_NAMESPACE = uuid.UUID("6f1c3a52-1d8e-4a8e-9a55-5a1f1d0c2b7e")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide session, so webhook calls reuse pooled keep-alive connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def idempotency_key(payload, nonce=None) -> str:
+    """
+    Stable key from booking_id + action, plus the new slot for reschedules and
+    the form's submission nonce, so a retried or double-submitted request
+    carries the same key and n8n can drop the duplicate, while a later request
+    that happens to repeat an earlier one (10:00 -> 11:00 -> 10:00) does not.
+    """
+    parts = [str(payload.get("booking_id") or ""), str(payload.get("action") or "book")]
+    if parts[1] == "reschedule":
+        parts += [str(payload.get(k, "")) for k in ("doctor", "new_date", "new_time")]
+    if not parts[0]:
+        # No booking id (old rows): fall back to the whole payload
+        parts.append(json.dumps(payload, sort_keys=True, default=str))
+    if nonce:
+        parts.append(str(nonce))
+    return str(uuid.uuid5(_IDEMPOTENCY_NAMESPACE, "|".join(parts)))
+
+
+def submission_nonce(state, form, payload):
+    """
+    Nonce for sending `payload` from `form`, kept in `state` (st.session_state).
+    Submitting the same request again reuses it, so double clicks share a key;
+    once a different request was submitted in between, a new one is drawn.
+    """
+    name = f"webhook_nonce_{form}"
+    request = idempotency_key(payload)
+    if state.get(name, (None, None))[0] != request:
+        state[name] = (request, uuid.uuid4().hex)
+    return state[name][1]
+
+
+def clear_submission(state, form):
+    """Forgets the nonce of `form` once its submission is queued."""
+    state.pop(f"webhook_nonce_{form}", None)
+
+
+def affected_days(payload):
+    """[(doctor, "YYYY-MM-DD")] whose availability a booking, cancel or reschedule changes."""
+    if payload.get("action") == "reschedule":
+        pairs = [(payload.get("old_doctor"), payload.get("old_date")), (payload.get("doctor"), payload.get("new_date"))]
+    else:
+        pairs = [(payload.get("doctor"), payload.get("date"))]
+    return [(doctor, str(day)[:10]) for doctor, day in pairs if doctor and day]
+
+
+def invalidate_after_delivery(payload):
+    # n8n has created or moved the event by now; drop anything cached while it was in flight
+    for doctor, day in affected_days(payload):
+        invalidate_availability(doctor, day)
+
+
+def backoff_delay(attempt, base=WEBHOOK_BACKOFF_BASE, cap=WEBHOOK_BACKOFF_CAP):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+def is_retryable(response=None, error=None):
+    if error is not None:
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    return response.status_code in RETRY_STATUSES
+
+
+def post_webhook(url, payload, key=None, max_retries=WEBHOOK_MAX_RETRIES, timeout=WEBHOOK_TIMEOUT, sleep=time.sleep):
+    """
+    POSTs `payload` as JSON with an Idempotency-Key header, retrying connection
+    errors, timeouts, 429 and 5xx with jittered backoff. Returns the last
+    response; raises the last error if no response was ever received.
+    """
+    if not url:
+        raise ValueError("Webhook URL is not configured")
+    key = key or idempotency_key(payload)
+    body = dict(payload, idempotency_key=key)
+    session = get_session()
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.post(url, json=body, timeout=timeout, headers={"Idempotency-Key": key})
+        except requests.RequestException as e:
+            if attempt == max_retries or not is_retryable(error=e):
+                raise
+            print(f"🔁 Webhook attempt {attempt + 1} failed ({e}), retrying")
+            sleep(backoff_delay(attempt))
+            continue
+        if response.status_code < 400 or attempt == max_retries or not is_retryable(response):
+            return response
+        print(f"🔁 Webhook attempt {attempt + 1} got HTTP {response.status_code}, retrying")
+        sleep(_retry_after(response) or backoff_delay(attempt))
+    return response
+
+
+class WebhookOutbox:
+    """
+    Durable queue of webhook calls in SQLite. `enqueue` returns at once; a
+    background worker delivers pending rows with retries and backoff, so a
+    booking survives an n8n outage or an app restart. Rows are claimed with a
+    lease, so several app processes can share the same file.
+    """
+
+    def __init__(self, db_path=WEBHOOK_OUTBOX_DB, max_attempts=OUTBOX_MAX_ATTEMPTS, poll_seconds=5.0,
+                 poster=None, clock=time.time, on_sent=None):
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        # Each outbox attempt is a single POST; retries are spread out by the outbox itself
+        self.poster = poster or (lambda url, payload, key: post_webhook(url, payload, key, max_retries=0))
+        self.clock = clock
+        # Called with the payload of every delivered row
+        self.on_sent = on_sent
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS webhook_outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, idempotency_key TEXT NOT NULL UNIQUE,"
+            " url TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL,"
+            " last_error TEXT, created_at REAL NOT NULL, sent_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS webhook_outbox_due ON webhook_outbox (status, next_attempt_at)"
+        )
+        self._conn.commit()
+
+    def enqueue(self, url, payload, key=None):
+        """
+        Stores the call and wakes the worker. Returns (key, created); created
+        is False when the key was already queued, and the call is not stored again.
+        """
+        if not url:
+            raise ValueError("Webhook URL is not configured")
+        key = key or idempotency_key(payload)
+        now = self.clock()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO webhook_outbox (idempotency_key, url, payload, next_attempt_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, url, json.dumps(payload, ensure_ascii=False, default=str), now, now),
+            )
+            self._conn.commit()
+        if not cur.rowcount:
+            print(f"♻️ Webhook {key} was already queued, not sending it again")
+            return key, False
+        self._wake.set()
+        return key, True
+
+    def status(self, key):
+        """{"status", "attempts", "last_error"} for a key, or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error FROM webhook_outbox WHERE idempotency_key = ?", (key,)
+            ).fetchone()
+        return dict(zip(("status", "attempts", "last_error"), row)) if row else None
+
+    def wait(self, key, timeout=5.0, interval=0.1):
+        """Waits up to `timeout` seconds for a delivery outcome; returns the latest status."""
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.status(key)
+            if state is None or state["status"] != "pending" or time.monotonic() >= deadline:
+                return state
+            time.sleep(interval)
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM webhook_outbox WHERE status = 'pending'").fetchone()[0]
+
+    def _claim_due(self, limit):
+        now = self.clock()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, idempotency_key, url, payload, attempts FROM webhook_outbox"
+                " WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                # Pushing next_attempt_at out is the lease; another worker sees the row as not due
+                cur = self._conn.execute(
+                    "UPDATE webhook_outbox SET next_attempt_at = ?"
+                    " WHERE id = ? AND status = 'pending' AND next_attempt_at <= ?",
+                    (now + OUTBOX_LEASE_SECONDS, row[0], now),
+                )
+                if cur.rowcount:
+                    claimed.append(row)
+            self._conn.commit()
+        return claimed
+
+    def _record(self, row_id, attempts, status, error=None):
+        now = self.clock()
+        if status == "pending":
+            next_attempt_at = now + backoff_delay(attempts, base=OUTBOX_BACKOFF_BASE, cap=OUTBOX_BACKOFF_CAP)
+        else:
+            next_attempt_at = now
+        with self._lock:
+            self._conn.execute(
+                "UPDATE webhook_outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?,"
+                " sent_at = CASE WHEN ? = 'sent' THEN ? ELSE sent_at END WHERE id = ?",
+                (status, attempts, next_attempt_at, error, status, now, row_id),
+            )
+            self._conn.commit()
+
+    def drain_once(self, limit=20):
+        """Attempts every due row once. Returns the number of rows delivered."""
+        delivered = 0
+        for row_id, key, url, payload, attempts in self._claim_due(limit):
+            attempts += 1
+            try:
+                body = json.loads(payload)
+            except ValueError as e:
+                # A stored row that can't be decoded will never be deliverable
+                print(f"❌ Webhook {key} failed permanently: {e}")
+                self._record(row_id, attempts, "failed", f"Bad payload: {e}")
+                continue
+            try:
+                response = self.poster(url, body, key)
+            except Exception as e:
+                # Any error is recorded per row, so neither this row nor the rest of the batch stays leased
+                status = "failed" if attempts >= self.max_attempts else "pending"
+                self._record(row_id, attempts, status, str(e) or repr(e))
+                continue
+            if response.status_code < 400:
+                self._record(row_id, attempts, "sent")
+                delivered += 1
+                if self.on_sent:
+                    try:
+                        self.on_sent(body)
+                    except Exception as e:
+                        print(f"⚠️ Webhook {key} post-delivery hook failed:", e)
+            elif is_retryable(response) and attempts < self.max_attempts:
+                self._record(row_id, attempts, "pending", f"HTTP {response.status_code}")
+            else:
+                # 4xx other than 408/425/429 will not get better by retrying
+                print(f"❌ Webhook {key} failed permanently: HTTP {response.status_code}")
+                self._record(row_id, attempts, "failed", f"HTTP {response.status_code}")
+        return delivered
+
+    def _run(self):
+        while True:
+            try:
+                self.drain_once()
+            except Exception as e:
+                print("⚠️ Webhook outbox worker error:", e)
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def start(self):
+        """Starts the background delivery thread once per outbox."""
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="webhook-outbox", daemon=True)
+                self._worker.start()
+        return self
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> WebhookOutbox:
+    """Process-wide outbox with its worker running."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = WebhookOutbox(on_sent=invalidate_after_delivery).start()
+        return _outbox
+
+
+def send_webhook(url, payload, nonce=None):
+    """Queues a webhook call for background delivery. Returns (idempotency key, created)."""
+    return get_outbox().enqueue(url, payload, idempotency_key(payload, nonce))
@@ -0,0 +1,183 @@
+"""In-process stand-ins for Google Calendar, Google Sheets, OpenAI and n8n."""
+import json
+import random
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from gspread.utils import a1_to_rowcol
+from langchain_core.language_models import FakeListChatModel
+from backend.calendar_backend import InMemoryCalendarBackend
+from backend.embeddings import HashingEmbeddings
+
+SHEET_HEADERS = ["name", "email", "phone", "age", "service", "doctor", "date", "duration", "note",
+                 "booking_id", "eventId"]
+
+
+# --- Google Calendar ---
+def fake_calendar(calendar_ids, days, events_per_day, start, seed=0):
+    """
+    InMemoryCalendarBackend with `events_per_day` events per calendar-day
+    between 09:00 and 17:00 (overlapping once the day is full).
+    """
+    rng = random.Random(seed)
+    backend = InMemoryCalendarBackend()
+    for calendar_id in calendar_ids:
+        for d in range(days):
+            day_start = start + timedelta(days=d)
+            for i in range(events_per_day):
+                offset = rng.randrange(0, 8 * 60 - 15, 5)
+                begin = day_start + timedelta(minutes=offset)
+                backend.add_event(calendar_id, begin, begin + timedelta(minutes=rng.choice((15, 30, 45, 60))),
+                                  event_id=f"{calendar_id}-{d}-{i}", summary=f"Treatment {i}")
+    return backend
+
+
+# --- Google Sheets ---
+class FakeSpreadsheet:
+    def __init__(self):
+        self.revision = "1"
+
+    def get_lastUpdateTime(self):
+        return self.revision
+
+
+class FakeWorksheet:
+    """The gspread Worksheet calls the sheet mirror makes, over a list of rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.spreadsheet = FakeSpreadsheet()
+        self.requests = 0
+
+    def row_values(self, row):
+        self.requests += 1
+        return list(self.rows[row - 1])
+
+    def col_values(self, col):
+        self.requests += 1
+        return [r[col - 1] for r in self.rows]
+
+    def get_values(self, range_name=None):
+        self.requests += 1
+        if range_name is None:
+            return [list(r) for r in self.rows]
+        first, last = range_name.split(":")
+        first_row, first_col = a1_to_rowcol(first)
+        last_row, last_col = a1_to_rowcol(last)
+        return [list(r[first_col - 1:last_col]) for r in self.rows[first_row - 1:last_row]]
+
+    def batch_get(self, ranges):
+        """Whole-row ranges ("1:1000"), all in one request like the real batchGet."""
+        self.requests += 1
+        result = []
+        for range_name in ranges:
+            first, last = (int(n) for n in range_name.split(":"))
+            # The API drops trailing empty cells
+            result.append([self._trim(r) for r in self.rows[first - 1:last]])
+        return result
+
+    @staticmethod
+    def _trim(row):
+        row = list(row)
+        while row and row[-1] == "":
+            row.pop()
+        return row
+
+
+def fake_clients_sheet(n_rows, doctors=("Dr A", "Dr B"), start=datetime(2026, 1, 5), seed=0):
+    rng = random.Random(seed)
+    rows = [list(SHEET_HEADERS)]
+    for i in range(n_rows):
+        day = start + timedelta(days=i // 40, minutes=rng.randrange(9 * 60, 17 * 60, 15))
+        rows.append([
+            f"Patient {i}", f"patient{i}@example.com", f"+33 6 {i:08d}", str(20 + i % 50), "Botox",
+            doctors[i % len(doctors)], day.strftime("%Y-%m-%d %H:%M"), "30", "",
+            f"booking-{i}", f"event{i}",
+        ])
+    return FakeWorksheet(rows)
+
+
+# --- Treatment catalog ---
+def synthetic_catalog(n_treatments, seed=0):
+    rng = random.Random(seed)
+    words = ["laser", "peel", "hydra", "micro", "needling", "lift", "glow", "firm", "tone", "radiance",
+             "collagen", "serum", "contour", "sculpt", "renew", "bright", "smooth", "pulse", "cryo", "led"]
+    items = []
+    for i in range(n_treatments):
+        name = f"{rng.choice(words).title()} {rng.choice(words).title()} {i}"
+        items.append({
+            "treatment": name,
+            "description": " ".join(rng.choice(words) for _ in range(30)) + ".",
+            "price": {f"{k} area": f"€{rng.randrange(80, 900)}" for k in range(1, rng.randrange(2, 5))},
+            "recommended_frequency": f"Every {rng.randrange(2, 12)} weeks",
+            "pre_care": [" ".join(rng.choice(words) for _ in range(6)) for _ in range(3)],
+            "post_care": [" ".join(rng.choice(words) for _ in range(6)) for _ in range(3)],
+            "effects": [" ".join(rng.choice(words) for _ in range(4)) for _ in range(2)],
+            "requires_numbing_cream": rng.random() < 0.5,
+            "makeup_after_hours": rng.choice([0, 12, 24, 48]),
+            "post_procedure_reactions": " ".join(rng.choice(words) for _ in range(10)),
+            "duration": rng.choice([15, 30, 45, 60, 90]),
+        })
+    return items
+
+
+# --- OpenAI ---
+class FakeOpenAIEmbeddings(HashingEmbeddings):
+    """Deterministic local vectors in place of OpenAI embeddings; counts how many texts were embedded."""
+
+    def __init__(self, n_features=256):
+        super().__init__(n_features=n_features)
+        self.embedded = 0
+
+    def embed_array(self, texts):
+        texts = list(texts)
+        self.embedded += len(texts)
+        return super().embed_array(texts)
+
+    def embed_query(self, text):
+        self.embedded += 1
+        return super().embed_query(text)
+
+
+def fake_chat_model(answer="Botox costs €250 for one area."):
+    """Chat model that answers instantly, so chain timings exclude LLM time."""
+    return FakeListChatModel(responses=[answer])
+
+
+# --- n8n ---
+class FakeN8n:
+    """Local HTTP server accepting webhook POSTs; `statuses` are replied in order, then 200."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.received = []
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, like a real n8n behind a proxy
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                owner.received.append((self.headers.get("Idempotency-Key"), json.loads(body or b"{}")))
+                status = owner.statuses.pop(0) if owner.statuses else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/webhook"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
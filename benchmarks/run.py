@@ -0,0 +1,377 @@
+"""
+Offline benchmarks for the hot paths, with Calendar, Sheets, OpenAI and n8n faked in-process.
+
+    python -m benchmarks.run                      # full sizes, writes bench_results.json
+    python -m benchmarks.run --quick --only availability,sheet
+    python -m benchmarks.run --compare old.json   # prints the change against an earlier run
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Offline configuration, read by the backend modules at import time
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
+os.environ.setdefault("LOCAL_EMBEDDING_DIM", "256")
+os.environ.setdefault("RETRIEVER_MODE", "numpy")
+os.environ.setdefault("CALENDAR_SYNC", "0")
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import pytz
+import requests
+from langchain_core.runnables import RunnableConfig
+import backend.calendar_utils as calendar_utils
+import backend.sheet_mirror as sheet_mirror
+from backend.bm25 import BM25Index
+from backend.calendar_sync import SyncedCalendarBackend
+from backend.catalog import Catalog, _catalogs
+from backend.doctor_assignment import find_next_available, plan_no_preference
+from backend.loader import build_documents, load_documents
+from backend.numpy_retriever import build_numpy_index
+from backend.sheet_utils import find_appointments_by_event_ids
+from backend.webhooks import WebhookOutbox, post_webhook
+from benchmarks.fakes import (FakeN8n, FakeOpenAIEmbeddings, fake_calendar, fake_chat_model,
+                              fake_clients_sheet, synthetic_catalog)
+
+# RunnableWithMessageHistory's tracer warns about every invoke outside a traced parent run
+logging.getLogger("langchain_core.tracers.base").setLevel(logging.ERROR)
+
+TZ = pytz.timezone("Europe/Paris")
+BENCH_DAY = datetime(2026, 3, 2)   # a Monday
+CALENDARS = {"Dr A": "bench-cal-a", "Dr B": "bench-cal-b"}
+
+
+def measure(name, fn, repeat=20, warmup=1, **params):
+    """Runs fn() `repeat` times and returns timing stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    result = {
+        "name": name,
+        "params": params,
+        "repeat": repeat,
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "p50_ms": round(timings[len(timings) // 2], 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        "min_ms": round(timings[0], 4),
+    }
+    report(f"  {name:<40} {json.dumps(params):<40} p50 {result['p50_ms']:>10.3f} ms   p95 {result['p95_ms']:>10.3f} ms")
+    return result
+
+
+def report(line):
+    # Written to the real stdout, so it still shows inside quiet()
+    print(line, file=sys.__stdout__, flush=True)
+
+
+def once(name, fn, **params):
+    """Times a single cold run (index builds, initial syncs)."""
+    return measure(name, fn, repeat=1, warmup=0, **params)
+
+
+@contextlib.contextmanager
+def quiet():
+    # The backend logs with print(); keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def use_fake_calendars(backend):
+    calendar_utils.DOCTORS.update(CALENDARS)
+    calendar_utils.set_calendar_backend(backend)
+
+
+# --- Benchmarks ---
+def bench_availability(quick):
+    results = []
+    day_str = BENCH_DAY.strftime("%Y-%m-%d")
+    day_start = TZ.localize(BENCH_DAY.replace(hour=9))
+    for events_per_day in ([10, 100] if quick else [10, 100, 1000]):
+        days = 14
+        fake = fake_calendar(CALENDARS.values(), days, events_per_day, day_start)
+        use_fake_calendars(fake)
+
+        def cold_slots():
+            calendar_utils.busy_cache.clear()
+            calendar_utils.get_available_slots("Dr A", day_str, 30)
+
+        results.append(measure("availability.get_available_slots.cold", cold_slots, events_per_day=events_per_day))
+        results.append(measure("availability.get_available_slots.cached",
+                               lambda: calendar_utils.get_available_slots("Dr A", day_str, 30),
+                               repeat=200, events_per_day=events_per_day))
+
+        def cold_plan():
+            calendar_utils.busy_cache.clear()
+            plan_no_preference(list(CALENDARS), day_str, 30)
+
+        results.append(measure("availability.no_preference.cold", cold_plan, events_per_day=events_per_day))
+
+        def cold_next():
+            calendar_utils.busy_cache.clear()
+            find_next_available(list(CALENDARS), 30, count=8, days=days, start_date=BENCH_DAY.date(),
+                                now=TZ.localize(BENCH_DAY))
+
+        results.append(measure("availability.next_available.cold", cold_next, repeat=5,
+                               events_per_day=events_per_day, days=days))
+
+        synced = SyncedCalendarBackend(fake, now=lambda: TZ.localize(BENCH_DAY))
+        with quiet():
+            use_fake_calendars(synced)
+            results.append(measure("availability.get_available_slots.synced", cold_slots,
+                                   events_per_day=events_per_day))
+    return results
+
+
+def bench_sheet(quick, workdir):
+    results = []
+    n_rows = 10_000 if quick else 100_000
+    worksheet = fake_clients_sheet(n_rows)
+    mirror = sheet_mirror.SheetMirror(os.path.join(workdir, f"mirror_{n_rows}.sqlite3"),
+                                      worksheet_factory=lambda: worksheet)
+    results.append(once("sheet.mirror.initial_sync", lambda: mirror.sync(force=True), rows=n_rows))
+    results[-1]["sheet_requests"] = worksheet.requests
+
+    rng = random.Random(1)
+    results.append(measure("sheet.by_booking_id", lambda: mirror.by_booking_id(f"booking-{rng.randrange(n_rows)}"),
+                           repeat=1000, rows=n_rows))
+    results.append(measure("sheet.by_event_ids", lambda: mirror.by_event_ids(
+        [f"event{rng.randrange(n_rows)}" for _ in range(30)]), repeat=200, rows=n_rows, ids=30))
+    results.append(measure("sheet.by_email", lambda: mirror.by_email(f"patient{rng.randrange(n_rows)}@example.com"),
+                           repeat=500, rows=n_rows))
+    results.append(measure("sheet.by_doctor_and_date", lambda: mirror.by_doctor_and_date(
+        "Dr A", (datetime(2026, 1, 5) + timedelta(days=rng.randrange(n_rows // 40))).strftime("%Y-%m-%d")),
+        repeat=500, rows=n_rows))
+
+    worksheet.rows.append(["New", "new@example.com", "", "", "Botox", "Dr B", "2026-06-01 10:00", "30", "",
+                           "booking-new", "event-new"])
+    worksheet.spreadsheet.revision = "2"
+    requests_before = worksheet.requests
+    results.append(once("sheet.mirror.append_sync", lambda: mirror.sync(force=True), rows=n_rows))
+    results[-1]["sheet_requests"] = worksheet.requests - requests_before
+    return results
+
+
+def bench_catalog(quick, workdir):
+    results = []
+    n_treatments = 1_000 if quick else 10_000
+    items = synthetic_catalog(n_treatments)
+    path = os.path.join(workdir, f"catalog_{n_treatments}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(items, f)
+
+    def cold_load(by_field):
+        _catalogs.clear()
+        return load_documents(path, by_field=by_field)
+
+    results.append(measure("catalog.load_documents", lambda: cold_load(False), repeat=3, treatments=n_treatments))
+    results.append(measure("catalog.load_documents.by_field", lambda: cold_load(True), repeat=3,
+                           treatments=n_treatments))
+    results.append(measure("catalog.load_documents.hot", lambda: load_documents(path, by_field=True), repeat=20,
+                           treatments=n_treatments))
+
+    docs = build_documents(items)
+    embedding = FakeOpenAIEmbeddings()
+    index_dir = os.path.join(workdir, f"numpy_index_{n_treatments}")
+    with quiet():
+        results.append(once("index.numpy.build", lambda: build_numpy_index(docs, embedding, "bench", index_dir),
+                            docs=len(docs)))
+        results[-1]["texts_embedded"] = embedding.embedded
+        embedding.embedded = 0
+        results.append(once("index.numpy.rebuild_unchanged",
+                            lambda: build_numpy_index(docs, embedding, "bench", index_dir), docs=len(docs)))
+        results[-1]["texts_embedded"] = embedding.embedded
+    results.append(once("index.bm25.build", lambda: BM25Index(docs), docs=len(docs)))
+    catalog = Catalog(items)
+    names = [t.name for t in catalog.treatments]
+    results.append(measure("catalog.get_duration", lambda: catalog.get_duration(random.choice(names)),
+                           repeat=1000, treatments=n_treatments))
+    return results
+
+
+def bench_chain(quick, workdir):
+    from backend.qa_chain_compatible_0325 import build_qa_chain
+
+    results = []
+    real_catalog = os.path.join(REPO_ROOT, "data", "aesthetic_treatments_final.json")
+    with open(real_catalog, encoding="utf-8") as f:
+        catalogs = {"clinic": json.load(f)}
+    catalogs["synthetic"] = synthetic_catalog(200 if quick else 1_000)
+    questions = [
+        "How much is Botox for two areas?",
+        "Can I wear makeup after microneedling?",
+        "What should I avoid before a chemical peel?",
+        "Is laser hair removal painful?",
+    ]
+    for label, items in catalogs.items():
+        docs = build_documents(items, by_field=True)
+        with quiet():
+            start = time.perf_counter()
+            chain = build_qa_chain(docs, llm=fake_chat_model())
+            build_ms = (time.perf_counter() - start) * 1000
+            counter = iter(range(10 ** 9))
+
+            def ask():
+                # A fresh session per call, so history size stays constant
+                chain.invoke({"question": random.choice(questions)},
+                             config=RunnableConfig(configurable={"session_id": f"bench-{next(counter)}"}))
+
+            result = measure("chain.invoke.no_llm", ask, repeat=50, catalog=label, docs=len(docs))
+        result["build_ms"] = round(build_ms, 3)
+        report(f"  {'chain.build':<40} {json.dumps({'catalog': label}):<40} {build_ms:>13.3f} ms")
+        results.append(result)
+    return results
+
+
+def bench_dashboard(quick, workdir):
+    """The dashboard's per-view work: list the day's events, then look up every patient in one query."""
+    results = []
+    appointments = 16 if quick else 32
+    day_start = TZ.localize(BENCH_DAY.replace(hour=9))
+    fake = fake_calendar(CALENDARS.values(), 1, appointments, day_start)
+    worksheet = fake_clients_sheet(10_000 if quick else 100_000)
+    for i, event in enumerate(fake.events[CALENDARS["Dr A"]]):
+        worksheet.rows[i + 1][10] = event["id"]
+    mirror = sheet_mirror.SheetMirror(os.path.join(workdir, "dashboard_mirror.sqlite3"),
+                                      worksheet_factory=lambda: worksheet)
+    with quiet():
+        mirror.sync(force=True)
+    sheet_mirror._mirror = mirror
+    synced = SyncedCalendarBackend(fake, now=lambda: TZ.localize(BENCH_DAY))
+
+    def assemble(backend):
+        events = backend.list_events(CALENDARS["Dr A"], TZ.localize(BENCH_DAY), TZ.localize(BENCH_DAY + timedelta(days=1)))
+        patients = find_appointments_by_event_ids([e["id"] for e in events])
+        return [(e["start"]["dateTime"][11:16], patients.get(e["id"], {}).get("name", "")) for e in events]
+
+    with quiet():
+        results.append(measure("dashboard.assemble.list_events", lambda: assemble(fake), repeat=100,
+                               appointments=appointments))
+        results.append(measure("dashboard.assemble.synced", lambda: assemble(synced), repeat=100,
+                               appointments=appointments))
+    return results
+
+
+def bench_webhooks(quick, workdir):
+    results = []
+    n = 50 if quick else 200
+    with FakeN8n() as n8n:
+        payload = {"booking_id": "bench", "action": "cancel", "name": "Bench"}
+        results.append(measure("webhook.requests_post.unpooled",
+                               lambda: requests.post(n8n.url, json=payload, timeout=10), repeat=n))
+        results.append(measure("webhook.post_webhook.pooled", lambda: post_webhook(n8n.url, payload), repeat=n))
+
+        outbox = WebhookOutbox(os.path.join(workdir, "outbox.sqlite3"), poll_seconds=0.01)
+        counter = iter(range(10 ** 9))
+        results.append(measure("webhook.outbox.enqueue",
+                               lambda: outbox.enqueue(n8n.url, dict(payload, booking_id=f"b{next(counter)}")),
+                               repeat=n))
+        pending = outbox.pending_count()
+        start = time.perf_counter()
+        while outbox.drain_once(limit=100):
+            pass
+        drain_ms = (time.perf_counter() - start) * 1000
+        results.append({"name": "webhook.outbox.drain", "params": {"rows": pending}, "repeat": 1,
+                        "total_ms": round(drain_ms, 3), "per_row_ms": round(drain_ms / max(1, pending), 4)})
+        report(f"  {'webhook.outbox.drain':<40} {json.dumps({'rows': pending}):<40} {drain_ms:>13.3f} ms total")
+    return results
+
+
+BENCHMARKS = {
+    "availability": lambda quick, workdir: bench_availability(quick),
+    "sheet": bench_sheet,
+    "catalog": bench_catalog,
+    "chain": bench_chain,
+    "dashboard": bench_dashboard,
+    "webhooks": bench_webhooks,
+}
+
+
+# --- Reporting ---
+def _key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(previous_path, results):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {_key(r): r for r in json.load(f)["results"]}
+    print(f"\nChange against {previous_path} (p50, or total time for the outbox drain):")
+    for result in results:
+        before = previous.get(_key(result))
+        metric = "p50_ms" if "p50_ms" in result else "total_ms"
+        if not before or not before.get(metric):
+            continue
+        ratio = result[metric] / before[metric]
+        flag = "  ⚠️ slower" if ratio > 1.2 else ""
+        print(f"  {result['name']:<40} {json.dumps(result['params']):<40} {ratio:>6.2f}x{flag}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller data sets, for a fast smoke run")
+    parser.add_argument("--only", default="", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "bench_results.json"))
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()] or list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="medspa-bench-") as workdir:
+        # Relative default paths (fresh_db/, *.sqlite3) land in the scratch directory, not the repo
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for name in selected:
+                print(f"▶ {name}")
+                results.extend(BENCHMARKS[name](args.quick, workdir))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
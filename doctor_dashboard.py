@@ -1,12 +1,7 @@
 import streamlit as st
 from datetime import datetime, timedelta
-import gspread
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 import pytz
 import numpy as np
-import json
-import requests
 import os
 from dotenv import load_dotenv
 
@@ -14,10 +9,12 @@ load_dotenv()
 N8N_WEBHOOK_MANAGE = os.getenv("WEBHOOK_MANAGE")
 DOCTOR_A_CALENDAR_ID = os.getenv("DOCTOR_A_CALENDAR_ID")
 DOCTOR_B_CALENDAR_ID = os.getenv("DOCTOR_B_CALENDAR_ID")
-CREDS_FILE = os.getenv("GOOGLE_CREDENTIALS_PATH")
 
 # Business utils
-from backend.calendar_utils import get_available_slots
+from backend.calendar_utils import get_available_slots, get_calendar_backend, invalidate_availability
+from backend.sheet_utils import find_appointments_by_event_ids
+from backend.catalog import get_catalog
+from backend.webhooks import get_outbox, send_webhook, submission_nonce
 
 # Configuration
 DOCTORS = {
@@ -25,37 +22,16 @@ DOCTORS = {
     "Dr B": DOCTOR_B_CALENDAR_ID,
 }
 
-with open("data/aesthetic_treatments_final.json", "r", encoding="utf-8") as f:
-    TREATMENTS = json.load(f)
-
-FALLBACK_DURATION = {
-    "Consultation": 20,
-    "Follow-up": 15,
-}
+CATALOG = get_catalog()
 
 def get_duration(service_name: str) -> int:
-    for t in TREATMENTS:
-        if t["treatment"].lower() == service_name.lower():
-            return int(t.get("duration", 30))
-    return int(FALLBACK_DURATION.get(service_name, 30))
-
-# Google API helpers
-def get_google_calendar_service():
-    credentials = service_account.Credentials.from_service_account_file(
-        CREDS_FILE,
-        scopes=["https://www.googleapis.com/auth/calendar"],
-    )
-    return build("calendar", "v3", credentials=credentials)
-
-def get_google_sheet_client():
-    credentials = service_account.Credentials.from_service_account_file(
-       CREDS_FILE,
-        scopes=[
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/drive",
-        ],
-    )
-    return gspread.authorize(credentials)
+    return CATALOG.get_duration(service_name)
+
+# Staff get the real outcome: queue through the outbox, then wait briefly for the delivery.
+# A repeated click on the same request reports the first submission's state ("duplicate": True)
+def deliver_webhook(url, payload, form, wait_seconds=8):
+    key, created = send_webhook(url, payload, submission_nonce(st.session_state, form, payload))
+    return dict(get_outbox().wait(key, timeout=wait_seconds), duplicate=not created)
 
 # Load appointments for a specific doctor and date
 def fetch_appointments(doctor: str, date):
@@ -63,59 +39,39 @@ def fetch_appointments(doctor: str, date):
     if not calendar_id:
         return []
 
-    service = get_google_calendar_service()
     tz = pytz.timezone("Europe/Paris")
     day_start = tz.localize(datetime.combine(date, datetime.min.time()))
-    day_end = tz.localize(datetime.combine(date, datetime.max.time()))
-
-    events_result = (
-        service.events()
-        .list(
-            calendarId=calendar_id,
-            timeMin=day_start.isoformat(),
-            timeMax=day_end.isoformat(),
-            singleEvents=True,
-            orderBy="startTime",
-        )
-        .execute()
-    )
-    return events_result.get("items", [])
-
-# Get patient info from Google Sheets based on event ID
-def get_patient_info(event_id: str):
+    day_end = tz.localize(datetime.combine(date + timedelta(days=1), datetime.min.time()))
+
+    # Served from the locally synced calendar copy; only changes are fetched from Google
+    return get_calendar_backend().list_events(calendar_id, day_start, day_end)
+
+EMPTY_PATIENT = {"Name": "", "Phone": "", "Age": "", "Email": "", "Event ID": "", "Time": "", "Service": "", "Doctor": ""}
+
+def _patient_from_row(row):
+    return {
+        "Name": safe_str(row.get("name", "")),
+        "Phone": safe_str(row.get("phone", "")),
+        "Age": safe_str(row.get("age", "")),
+        "Email": safe_str(row.get("email", "")),
+        "Event ID": safe_str(str(row.get("eventId") or "").strip()),
+        "Time": safe_str(str(row.get("date", "")).split(" ")[-1][:5]),
+        "Service": safe_str(row.get("service", "")),
+        "Doctor": safe_str(row.get("doctor", "")),
+        "Booking ID": safe_str(row.get("booking_id", ""))
+    }
+
+# Get patient info for a whole day of events with one sheet read, joined in memory
+def get_patients_for_events(event_ids):
     try:
-        sheet = (
-            get_google_sheet_client()
-            .open("Aesthetic_clinique")
-            .worksheet("clients_info")
-        )
-        records = sheet.get_all_records()
-        
-        print("🔍 Looking for event ID in Google Sheet:", event_id)
-
-        for row in records:
-            row_event_id = str(row.get("eventId") or "").strip()
-            
-            # Debug print to help compare what's in the sheet
-            print("👀 Row eventId:", row_event_id)
-
-            if row_event_id and row_event_id == str(event_id).strip():
-                return {
-                    "Name": safe_str(row.get("name", "")),
-                    "Phone": safe_str(row.get("phone", "")),
-                    "Age": safe_str(row.get("age", "")),
-                    "Email": safe_str(row.get("email", "")),
-                    "Event ID": safe_str(row_event_id),
-                    "Time": safe_str(str(row.get("date", "")).split(" ")[-1][:5]),
-                    "Service": safe_str(row.get("service", "")),
-                    "Doctor": safe_str(row.get("doctor", "")),
-                    "Booking ID": safe_str(row.get("booking_id", ""))
-                }
-
+        found = find_appointments_by_event_ids(event_ids)
     except Exception as e:
-        print("Error in get_patient_info:", e)
-
-    return {"Name": "", "Phone": "", "Age": "", "Email": "", "Event ID": "", "Time": "", "Service": "", "Doctor": ""}
+        print("Error in get_patients_for_events:", e)
+        found = {}
+    return {
+        event_id: _patient_from_row(found[str(event_id).strip()]) if str(event_id).strip() in found else dict(EMPTY_PATIENT)
+        for event_id in event_ids
+    }
 
 # Helper to safely convert values to string
 def safe_str(value):
@@ -138,6 +94,7 @@ sel_doctor = st.selectbox("👩‍⚕️ Select Doctor", list(DOCTORS.keys()))
 sel_date = st.date_input("🗕️ Select Date", value=datetime.today().date())
 
 appointments = fetch_appointments(sel_doctor, sel_date)
+patients = get_patients_for_events([ev.get("id", "") for ev in appointments])
 rows = []
 for ev in appointments:
     try:
@@ -146,7 +103,7 @@ for ev in appointments:
             continue
         time_str = start_time[11:16]
         event_id = ev.get("id", "")
-        p = get_patient_info(event_id)
+        p = patients[event_id]
         rows.append({
             "Time": safe_str(time_str),
             "Name": p.get("Name", ""),
@@ -158,9 +115,6 @@ for ev in appointments:
             "Doctor": p.get("Doctor", sel_doctor) or sel_doctor,
             "Booking ID": p.get("Booking ID", ""),
         })
-        print("Event time:", time_str, "| Event ID:", event_id)
-        print("Searching for Event ID in Sheet:", event_id)
-
     except Exception as e:
         print("[parse error]", e)
 
@@ -203,13 +157,19 @@ for i, r in enumerate(rows):
             "booking_id": r["Booking ID"]
         }
         try:
-            res = requests.post(N8N_WEBHOOK_MANAGE, json=payload, timeout=20)
-            if res.status_code == 200:
+            state = deliver_webhook(N8N_WEBHOOK_MANAGE, payload, f"cancel_{r['Event ID']}")
+            if state["duplicate"]:
+                st.info(f"ℹ️ This cancellation was already submitted (status: {state['status']}).")
+            elif state["status"] == "sent":
                 st.success("🗑️ Appointment successfully cancelled.")
+            elif state["status"] == "pending":
+                st.info("⏳ n8n is not responding yet; the cancellation is queued and will be retried automatically.")
             else:
-                st.error(f"❌ Failed to cancel appointment. HTTP {res.status_code}")
+                st.error(f"❌ Failed to cancel appointment. {state['last_error']}")
         except Exception as e:
             st.error(f"❌ Failed to cancel appointment: {e}")
+        finally:
+            invalidate_availability(r["Doctor"], sel_date)
 
 # Edit and reschedule section
 idx = st.session_state.editing_row
@@ -229,7 +189,7 @@ if idx is not None and 0 <= idx < len(rows):
     new_doctor = st.selectbox("👩‍⚕️ Select doctor", list(DOCTORS.keys()), index=list(DOCTORS.keys()).index(st.session_state.reschedule_doctor), key="reschedule_doctor")
     new_date = st.date_input("📅 New date", value=st.session_state.reschedule_date, min_value=datetime.today().date(), key="reschedule_date")
 
-    treatment_options = ["Consultation"] + [t["treatment"] for t in TREATMENTS]
+    treatment_options = list(CATALOG.treatment_options)
     treatment = st.selectbox("💆 Treatment", options=treatment_options, index=(treatment_options.index(st.session_state.reschedule_treatment) if st.session_state.reschedule_treatment in treatment_options else 0), key="reschedule_treatment")
 
     # Dynamically update available time slots
@@ -271,14 +231,23 @@ if idx is not None and 0 <= idx < len(rows):
             }
 
             try:
-                res = requests.post(N8N_WEBHOOK_MANAGE, json=payload, timeout=20)
-                if res.status_code == 200:
+                state = deliver_webhook(N8N_WEBHOOK_MANAGE, payload, f"reschedule_{row['Event ID']}")
+                if state["duplicate"]:
+                    st.info(f"ℹ️ This reschedule was already submitted (status: {state['status']}).")
+                    st.session_state.editing_row = None
+                elif state["status"] == "sent":
                     st.success("✅ Appointment successfully rescheduled.")
                     st.session_state.editing_row = None
+                elif state["status"] == "pending":
+                    st.info("⏳ n8n is not responding yet; the reschedule is queued and will be retried automatically.")
+                    st.session_state.editing_row = None
                 else:
-                    st.error(f"❌ Failed to reschedule. HTTP {res.status_code}")
+                    st.error(f"❌ Failed to reschedule. {state['last_error']}")
             except Exception as e:
                 st.error(f"❌ Failed to reschedule: {e}")
+            finally:
+                invalidate_availability(row["Doctor"], sel_date)
+                invalidate_availability(new_doctor, new_date)
 
 # Exit edit mode
 if st.session_state.editing_row is not None: